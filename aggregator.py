@@ -14,3 +14,114 @@ def aggregate_tags(tag_lists):
         counter.update(tags)
     logger.info(f"Aggregation complete. Found {len(counter)} unique tags.")
     return dict(counter)
+
+class WeightStats:
+    """
+    Running weight/position statistics of one tag, updated in O(1) per
+    occurrence with Welford's algorithm (no samples are kept).
+    """
+    __slots__ = ('n', 'mean_weight', 'm2_weight', 'min_weight', 'max_weight',
+                 'mean_position', 'lora_n', 'mean_lora_weight')
+
+    def __init__(self):
+        self.n = 0
+        self.mean_weight = 0.0
+        self.m2_weight = 0.0
+        self.min_weight = None
+        self.max_weight = None
+        self.mean_position = 0.0
+        self.lora_n = 0
+        self.mean_lora_weight = 0.0
+
+    def update(self, weight, position, lora_weight=None):
+        self.n += 1
+        delta = weight - self.mean_weight
+        self.mean_weight += delta / self.n
+        self.m2_weight += delta * (weight - self.mean_weight)
+        self.min_weight = weight if self.min_weight is None else min(self.min_weight, weight)
+        self.max_weight = weight if self.max_weight is None else max(self.max_weight, weight)
+        self.mean_position += (position - self.mean_position) / self.n
+        if lora_weight is not None:
+            self.lora_n += 1
+            self.mean_lora_weight += (lora_weight - self.mean_lora_weight) / self.lora_n
+
+    def combine(self, other):
+        """Folds another tag's statistics into this one (Chan et al. parallel update)."""
+        if not other.n:
+            return
+        n = self.n + other.n
+        delta = other.mean_weight - self.mean_weight
+        self.m2_weight += other.m2_weight + delta * delta * self.n * other.n / n
+        self.mean_weight += delta * other.n / n
+        self.mean_position += (other.mean_position - self.mean_position) * other.n / n
+        self.min_weight = other.min_weight if self.min_weight is None else min(self.min_weight, other.min_weight)
+        self.max_weight = other.max_weight if self.max_weight is None else max(self.max_weight, other.max_weight)
+        if other.lora_n:
+            lora_n = self.lora_n + other.lora_n
+            self.mean_lora_weight += (other.mean_lora_weight - self.mean_lora_weight) * other.lora_n / lora_n
+            self.lora_n = lora_n
+        self.n = n
+
+    def summary(self):
+        return {
+            'mean_weight': round(self.mean_weight, 4),
+            'std_weight': round((self.m2_weight / self.n) ** 0.5, 4) if self.n else 0.0,
+            'min_weight': self.min_weight,
+            'max_weight': self.max_weight,
+            'mean_position': round(self.mean_position, 2),
+            'mean_lora_weight': round(self.mean_lora_weight, 4) if self.lora_n else None,
+        }
+
+    def to_list(self):
+        return [getattr(self, name) for name in self.__slots__]
+
+    @classmethod
+    def from_list(cls, values):
+        stats = cls()
+        for name, value in zip(cls.__slots__, values):
+            setattr(stats, name, value)
+        return stats
+
+class TagStatistics:
+    """Per-tag WeightStats kept alongside the counts during a single scan."""
+    def __init__(self):
+        self.tags = {}
+
+    def add(self, tokens):
+        """Records the PromptTokens of one prompt."""
+        for token in tokens:
+            stats = self.tags.get(token.tag)
+            if stats is None:
+                stats = self.tags[token.tag] = WeightStats()
+            stats.update(token.weight, token.position, token.lora_weight)
+
+    def get(self, tag):
+        stats = self.tags.get(tag)
+        return stats.summary() if stats else None
+
+    def delete(self, tags):
+        for tag in tags:
+            self.tags.pop(tag, None)
+
+    def merge(self, tags, target):
+        """Combines the statistics of tags into target (rename is a merge of one tag)."""
+        for tag in tags:
+            if tag == target or tag not in self.tags:
+                continue
+            stats = self.tags.pop(tag)
+            if target in self.tags:
+                self.tags[target].combine(stats)
+            else:
+                self.tags[target] = stats
+
+    def to_dict(self):
+        return {tag: stats.to_list() for tag, stats in self.tags.items()}
+
+    @classmethod
+    def from_dict(cls, data):
+        statistics = cls()
+        statistics.tags = {tag: WeightStats.from_list(values) for tag, values in data.items()}
+        return statistics
+
+    def __len__(self):
+        return len(self.tags)
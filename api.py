@@ -0,0 +1,238 @@
+import os
+import json
+import time
+import uuid
+import heapq
+import asyncio
+import logging
+import threading
+from operator import itemgetter
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Literal, Optional
+from fastapi import APIRouter, HTTPException
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel
+from scanner import scan_path
+from editor import apply_edit
+from thumbnails import MAX_EXAMPLES_PER_TAG
+
+logger = logging.getLogger(__name__)
+
+# Scans run on their own pool so API jobs queue up instead of competing with the UI
+SCAN_CONCURRENCY = int(os.environ.get("API_SCAN_CONCURRENCY", "1"))
+# Finished jobs kept in memory for fetching counts
+MAX_FINISHED_JOBS = 20
+# Partial results are refreshed at most this often while scanning (seconds)
+SNAPSHOT_INTERVAL = 0.5
+# Largest top-N served in progress events
+MAX_TOP_N = 100
+
+QUEUED, RUNNING, DONE, FAILED = 'queued', 'running', 'done', 'failed'
+
+class ScanJob:
+    """A queued or running scan and its partial / final results."""
+    def __init__(self, path, dedup=False):
+        self.id = uuid.uuid4().hex
+        self.path = path
+        self.dedup = dedup
+        self.status = QUEUED
+        self.error = None
+        self.processed = 0
+        self.total = None
+        self.result = None
+        self.duplicates = None
+        self.lock = threading.Lock()
+        # Top tags while scanning, refreshed from the scan thread
+        self._top = []
+        self._unique_tags = 0
+        self._last_snapshot = 0.0
+        self._sorted_counts = None
+
+    def on_progress(self, processed, total, tag_counts):
+        now = time.monotonic()
+        with self.lock:
+            self.processed, self.total = processed, total
+            if now - self._last_snapshot < SNAPSHOT_INTERVAL and processed < total:
+                return
+        # Computed outside the lock, tag_counts is only mutated by this thread
+        top = heapq.nlargest(MAX_TOP_N, tag_counts.items(), key=itemgetter(1))
+        with self.lock:
+            self._top, self._unique_tags, self._last_snapshot = top, len(tag_counts), now
+
+    def run(self):
+        with self.lock:
+            self.status = RUNNING
+        logger.info(f"API scan {self.id} started: {self.path}")
+        try:
+            result = scan_path(self.path, self.on_progress, dedup=self.dedup)
+            with self.lock:
+                self.result = result
+                self.total = self.processed = result.total_files - result.duplicates
+                self.duplicates = result.duplicates
+                self._top = heapq.nlargest(MAX_TOP_N, result.tag_counts.items(), key=itemgetter(1))
+                self._unique_tags = len(result.tag_counts)
+                self.status = DONE
+            logger.info(f"API scan {self.id} finished: {result.total_files} images")
+        except Exception as e:
+            logger.error(f"API scan {self.id} failed: {e}")
+            with self.lock:
+                self.error = str(e)
+                self.status = FAILED
+
+    def summary(self, top_n=0):
+        with self.lock:
+            summary = {
+                'id': self.id,
+                'path': self.path,
+                'status': self.status,
+                'processed': self.processed,
+                'total': self.total,
+                'unique_tags': self._unique_tags,
+                'dedup': self.dedup,
+                'duplicates': self.duplicates,
+                'error': self.error,
+            }
+            if top_n:
+                summary['top'] = [[tag, count] for tag, count in self._top[:top_n]]
+            return summary
+
+    def sorted_counts(self):
+        """Final counts sorted by count descending, cached across pages until the next edit."""
+        with self.lock:
+            if self._sorted_counts is None:
+                self._sorted_counts = sorted(self.result.tag_counts.items(), key=lambda x: (-x[1], x[0]))
+            return self._sorted_counts
+
+    def edit(self, operations):
+        # Validate everything first so a bad operation doesn't leave a half-applied batch
+        for op in operations:
+            if op.op in ('rename', 'merge') and not op.target:
+                raise ValueError(f"{op.op} requires a target")
+            if op.op == 'rename' and len(op.tags) != 1:
+                raise ValueError("Rename requires exactly one tag.")
+        with self.lock:
+            tag_counts, timeline, examples = self.result.tag_counts, self.result.timeline, self.result.examples
+            for op in operations:
+                tag_counts, examples = apply_edit(
+                    tag_counts, timeline, examples, op.op, op.tags, op.target, MAX_EXAMPLES_PER_TAG,
+                    self.result.stats
+                )
+            self.result = self.result._replace(tag_counts=tag_counts, examples=examples)
+            self._sorted_counts = None
+            self._top = heapq.nlargest(MAX_TOP_N, tag_counts.items(), key=itemgetter(1))
+            self._unique_tags = len(tag_counts)
+
+class JobManager:
+    """Queues scan jobs on a bounded pool and keeps recent ones addressable by id."""
+    def __init__(self, concurrency=SCAN_CONCURRENCY):
+        self.pool = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="api-scan")
+        self.jobs = OrderedDict()
+        self.lock = threading.Lock()
+
+    def submit(self, path, dedup=False):
+        job = ScanJob(path, dedup)
+        with self.lock:
+            self.jobs[job.id] = job
+            self._prune()
+        self.pool.submit(job.run)
+        return job
+
+    def get(self, job_id):
+        with self.lock:
+            job = self.jobs.get(job_id)
+        if job is None:
+            raise HTTPException(status_code=404, detail=f"Unknown job: {job_id}")
+        return job
+
+    def _prune(self):
+        finished = [j for j in self.jobs.values() if j.status in (DONE, FAILED)]
+        for job in finished[:max(0, len(finished) - MAX_FINISHED_JOBS)]:
+            del self.jobs[job.id]
+
+class ScanRequest(BaseModel):
+    path: str = "/input"
+    dedup: bool = False
+
+class EditOperation(BaseModel):
+    op: Literal['delete', 'rename', 'merge']
+    tags: List[str]
+    target: Optional[str] = None
+
+class EditRequest(BaseModel):
+    operations: List[EditOperation]
+
+jobs = JobManager()
+router = APIRouter(prefix="/api/v1")
+
+@router.post("/scans", status_code=202)
+def start_scan(request: ScanRequest):
+    if not os.path.exists(request.path):
+        raise HTTPException(status_code=400, detail=f"Path does not exist: {request.path}")
+    job = jobs.submit(request.path, request.dedup)
+    logger.info(f"API scan {job.id} queued: {request.path}")
+    return job.summary()
+
+@router.get("/scans")
+def list_scans():
+    with jobs.lock:
+        return [job.summary() for job in jobs.jobs.values()]
+
+@router.get("/scans/{job_id}")
+def get_scan(job_id: str, top: int = 0):
+    return jobs.get(job_id).summary(min(max(top, 0), MAX_TOP_N))
+
+@router.get("/scans/{job_id}/events")
+async def scan_events(job_id: str, top: int = 20, interval: float = 1.0):
+    """Streams progress and partial top-N counts as Server-Sent Events until the job ends."""
+    job = jobs.get(job_id)
+    top = min(max(top, 0), MAX_TOP_N)
+    interval = max(interval, SNAPSHOT_INTERVAL)
+
+    async def events():
+        last = None
+        while True:
+            summary = job.summary(top)
+            if summary != last:
+                yield f"event: progress\ndata: {json.dumps(summary)}\n\n"
+                last = summary
+            if summary['status'] in (DONE, FAILED):
+                yield f"event: {summary['status']}\ndata: {json.dumps(summary)}\n\n"
+                return
+            await asyncio.sleep(interval)
+
+    return StreamingResponse(events(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
+
+def _finished_job(job_id):
+    job = jobs.get(job_id)
+    if job.status != DONE:
+        raise HTTPException(status_code=409, detail=f"Job {job_id} is {job.status}")
+    return job
+
+@router.get("/scans/{job_id}/counts")
+def get_counts(job_id: str, offset: int = 0, limit: int = 100, stats: bool = False):
+    """Paginated counts; with stats=true each row also carries weight/position statistics."""
+    job = _finished_job(job_id)
+    counts = job.sorted_counts()
+    offset, limit = max(offset, 0), min(max(limit, 1), 10000)
+    page = counts[offset:offset + limit]
+    if stats:
+        rows = [{'tag': tag, 'count': count, **(job.result.stats.get(tag) or {})} for tag, count in page]
+    else:
+        rows = [[tag, count] for tag, count in page]
+    return {
+        'total': len(counts),
+        'offset': offset,
+        'limit': limit,
+        'counts': rows,
+    }
+
+@router.post("/scans/{job_id}/edits")
+def edit_counts(job_id: str, request: EditRequest):
+    job = _finished_job(job_id)
+    try:
+        job.edit(request.operations)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    logger.info(f"API scan {job.id}: applied {len(request.operations)} edit operations")
+    return job.summary()
@@ -3,10 +3,17 @@ import os
 import logging
 import sys
 import json
-from loader import get_image_files_generator, extract_prompt
-from parser import parse_prompt
-from aggregator import aggregate_tags
-from editor import delete_tags, rename_tag, merge_tags
+import asyncio
+import uvicorn
+from fastapi import FastAPI
+from datetime import date, timedelta
+from scanner import scan_path
+import api
+from aggregator import aggregate_tags, TagStatistics
+from editor import apply_edit, table_edits
+from exporter import export_tags, EXPORT_FORMATS
+from timeline import TagTimeline
+from thumbnails import ThumbnailCache, THUMBNAIL_POOL, MAX_EXAMPLES_PER_TAG
 
 # Configure logging for the root logger to capture all module output
 logging.basicConfig(
@@ -17,126 +24,205 @@ logging.basicConfig(
 )
 logger = logging.getLogger("prompt-aggregator")
 
-def process_path(path, progress=gr.Progress()):
+# UI labels for exporter LoRA filters
+LORA_FILTER_CHOICES = {"All tags": "all", "LoRA only": "lora", "Exclude LoRA": "no_lora"}
+EXPORT_ORDER_CHOICES = {"Default (txt A-Z, tsv/yaml by count)": None, "Alphabetical": "alpha", "By count": "count"}
+
+TIMELINE_PATH = "/data/timeline.json"
+EXAMPLES_PATH = "/data/examples.json"
+STATS_PATH = "/data/tag_stats.json"
+
+thumbnail_cache = ThumbnailCache()
+
+def process_path(path, dedup=False, progress=gr.Progress()):
     logger.info(f"Processing path: {path}")
     if not path:
         logger.warning("No path provided.")
-        return "Current active path: None", 0, [], "", {}
+        return "Current active path: None", 0, [], "", {}, TagTimeline(), {}, TagStatistics()
     if not os.path.exists(path):
         logger.error(f"Path does not exist: {path}")
-        return f"Path does not exist: {path}", 0, [], "", {}
+        return f"Path does not exist: {path}", 0, [], "", {}, TagTimeline(), {}, TagStatistics()
 
-    # Lazy iteration: first pass to get total count for progress bar
-    total_files = sum(1 for _ in get_image_files_generator(path))
-    logger.info(f"Found {total_files} images in {path}")
+    def on_progress(processed, total, tag_counts):
+        if progress:
+            progress(processed / total, desc=f"Processed {processed}/{total}")
 
+    total_files, tag_counts, timeline, examples, stats, duplicates = scan_path(path, on_progress, dedup=dedup)
     if total_files == 0:
-        return f"Current active path: {path}", 0, [], "", {}
-
-    tag_counts = {}
-    batch_size = 10
-
-    # Second pass: lazy iteration for processing
-    for i, f in enumerate(get_image_files_generator(path)):
-        prompt = extract_prompt(f)
-        tags = parse_prompt(prompt)
-
-        # Update counts
-        for tag in tags:
-            tag_counts[tag] = tag_counts.get(tag, 0) + 1
-
-        # Update progress and log in batches
-        if (i + 1) % batch_size == 0 or (i + 1) == total_files:
-            if progress:
-                progress((i + 1) / total_files, desc=f"Processed {i + 1}/{total_files}")
-            logger.info(f"Progress: {i + 1}/{total_files} images processed")
+        return f"Current active path: {path}", 0, [], "", {}, TagTimeline(), {}, TagStatistics()
 
     # Sort by count descending initially
     sorted_tags = sorted(tag_counts.items(), key=lambda x: x[1], reverse=True)
 
-    df_data = [[False, tag, count] for tag, count in sorted_tags]
+    df_data = [[False, tag, count, tag] for tag, count in sorted_tags]
     preview = "\n".join([tag for tag, count in sorted_tags])
 
-    return f"Current active path: {path}", total_files, df_data, preview, tag_counts
+    active = f"Current active path: {path}"
+    if dedup:
+        active += f" ({duplicates} duplicate images skipped)"
+    return active, total_files, df_data, preview, tag_counts, timeline, examples, stats
 
-def update_from_df(df_data):
-    # df_data is a list of lists: [[Select, Tag, Count], ...]
-    new_tag_counts = {}
+def update_from_df(df_data, tag_counts, timeline, examples, stats):
+    # df_data is a list of lists: [[Select, Tag, Count, Original Tag], ...]
+    rows = []
     for row in df_data:
+        key = row[3] if len(row) > 3 and isinstance(row[3], str) and row[3] else None
         try:
-            tag = str(row[1]).strip()
-            count = int(row[2])
-            if tag:
-                if tag in new_tag_counts:
-                    new_tag_counts[tag] += count
-                else:
-                    new_tag_counts[tag] = count
+            rows.append((key, bool(row[0]), str(row[1]).strip(), int(row[2])))
         except (IndexError, ValueError, TypeError):
-            continue
+            # Unreadable rows are dropped like cleared ones
+            rows.append((key, False, '', 0))
+
+    # Mirror renamed/removed rows into the timeline, examples and statistics
+    for op, tags, target in table_edits(tag_counts, [(key, tag) for key, _, tag, _ in rows]):
+        logger.info(f"Inline edit: {op} {tags} {target or ''}".rstrip())
+        _, examples = apply_edit(tag_counts, timeline, examples, op, tags, target, MAX_EXAMPLES_PER_TAG, stats)
+
+    # Counts come from the table; rows renamed onto an existing tag collapse into it
+    new_tag_counts = {}
+    selected = {}
+    for _, select, tag, count in rows:
+        if tag:
+            new_tag_counts[tag] = new_tag_counts.get(tag, 0) + count
+            selected[tag] = selected.get(tag, False) or select
 
+    new_df_data = [[selected[tag], tag, count, tag] for tag, count in new_tag_counts.items()]
     sorted_tags = sorted(new_tag_counts.items(), key=lambda x: x[1], reverse=True)
     preview = "\n".join([tag for tag, count in sorted_tags])
-    return preview, new_tag_counts
+    return new_df_data, preview, new_tag_counts, timeline, examples, stats
 
-def handle_delete(df_data, tag_counts):
+def handle_delete(df_data, tag_counts, timeline, examples, stats):
     tags_to_delete = [row[1] for row in df_data if row[0]]
     logger.info(f"Deleting tags: {tags_to_delete}")
-    new_tag_counts = delete_tags(tag_counts, tags_to_delete)
+    new_tag_counts, examples = apply_edit(tag_counts, timeline, examples, 'delete', tags_to_delete, stats=stats)
 
     sorted_tags = sorted(new_tag_counts.items(), key=lambda x: x[1], reverse=True)
-    new_df_data = [[False, tag, count] for tag, count in sorted_tags]
+    new_df_data = [[False, tag, count, tag] for tag, count in sorted_tags]
     preview = "\n".join([tag for tag, count in sorted_tags])
-    return new_df_data, preview, new_tag_counts
+    return new_df_data, preview, new_tag_counts, timeline, examples, stats
 
-def handle_rename(df_data, tag_counts, new_name):
+def handle_rename(df_data, tag_counts, timeline, examples, stats, new_name):
     selected = [row[1] for row in df_data if row[0]]
     if len(selected) != 1:
         logger.warning(f"Rename failed: {len(selected)} tags selected (exactly 1 required).")
         gr.Warning("Please select exactly one tag to rename.")
-        return df_data, "\n".join(sorted(tag_counts.keys())), tag_counts
+        return df_data, "\n".join(sorted(tag_counts.keys())), tag_counts, timeline, examples, stats
 
     old_name = selected[0]
     logger.info(f"Renaming tag '{old_name}' to '{new_name}'")
-    new_tag_counts = rename_tag(tag_counts, old_name, new_name)
+    new_tag_counts, examples = apply_edit(
+        tag_counts, timeline, examples, 'rename', [old_name], new_name, MAX_EXAMPLES_PER_TAG, stats
+    )
 
     sorted_tags = sorted(new_tag_counts.items(), key=lambda x: x[1], reverse=True)
-    new_df_data = [[False, tag, count] for tag, count in sorted_tags]
+    new_df_data = [[False, tag, count, tag] for tag, count in sorted_tags]
     preview = "\n".join([tag for tag, count in sorted_tags])
-    return new_df_data, preview, new_tag_counts
+    return new_df_data, preview, new_tag_counts, timeline, examples, stats
 
-def handle_merge(df_data, tag_counts, target_name):
+def handle_merge(df_data, tag_counts, timeline, examples, stats, target_name):
     selected = [row[1] for row in df_data if row[0]]
     if not selected:
         logger.warning("Merge failed: No tags selected.")
         gr.Warning("No tags selected to merge.")
-        return df_data, "\n".join(sorted(tag_counts.keys())), tag_counts
+        return df_data, "\n".join(sorted(tag_counts.keys())), tag_counts, timeline, examples, stats
 
     logger.info(f"Merging tags {selected} into '{target_name}'")
-    new_tag_counts = merge_tags(tag_counts, selected, target_name)
+    new_tag_counts, examples = apply_edit(
+        tag_counts, timeline, examples, 'merge', selected, target_name, MAX_EXAMPLES_PER_TAG, stats
+    )
 
     sorted_tags = sorted(new_tag_counts.items(), key=lambda x: x[1], reverse=True)
-    new_df_data = [[False, tag, count] for tag, count in sorted_tags]
+    new_df_data = [[False, tag, count, tag] for tag, count in sorted_tags]
     preview = "\n".join([tag for tag, count in sorted_tags])
-    return new_df_data, preview, new_tag_counts
+    return new_df_data, preview, new_tag_counts, timeline, examples, stats
+
+def show_trends(timeline, start_text, end_text):
+    """Returns (status, trending rows, declining rows) for a date range from the timeline."""
+    span = timeline.span()
+    if span is None:
+        return "No dated images scanned yet.", [], []
+    try:
+        end = date.fromisoformat(end_text.strip()) if end_text and end_text.strip() else span[1]
+        start = date.fromisoformat(start_text.strip()) if start_text and start_text.strip() else end - timedelta(days=6)
+    except ValueError as e:
+        return f"Invalid date: {e}", [], []
+    if start > end:
+        return "Start date must not be after end date.", [], []
+
+    rows = timeline.trends(start, end)
+    trending = [[tag, count, prev, change] for tag, count, prev, change in rows if change > 0]
+    declining = [[tag, count, prev, change] for tag, count, prev, change in reversed(rows) if change < 0]
+    status = f"{start} to {end} vs. previous {(end - start).days + 1} days (data covers {span[0]} to {span[1]})"
+    return status, trending, declining
+
+def show_tag_stats(tag_counts, stats):
+    """Returns rows of [Tag, Count, Mean Weight, Min, Max, Mean Position, Mean LoRA Weight], by count."""
+    rows = []
+    for tag, count in sorted(tag_counts.items(), key=lambda x: x[1], reverse=True):
+        summary = stats.get(tag)
+        if summary:
+            rows.append([
+                tag, count, summary['mean_weight'], summary['min_weight'], summary['max_weight'],
+                summary['mean_position'], summary['mean_lora_weight']
+            ])
+    return rows
+
+def example_thumbnail(path):
+    """Returns the cached thumbnail of an example image, or None if it no longer exists."""
+    # Runs on THUMBNAIL_POOL, the existence check is I/O on the input mount as well
+    if not os.path.exists(path):
+        return None
+    return thumbnail_cache.get(path)
+
+async def show_examples(df_data, examples):
+    """Returns (status, thumbnails) for the selected tag, generating thumbnails off the event loop."""
+    selected = [row[1] for row in df_data if row[0]]
+    if len(selected) != 1:
+        return "Select exactly one tag to show examples.", []
+
+    tag = selected[0]
+    paths = examples.get(tag, [])
+    loop = asyncio.get_running_loop()
+    results = await asyncio.gather(
+        *(loop.run_in_executor(THUMBNAIL_POOL, example_thumbnail, p) for p in paths),
+        return_exceptions=True
+    )
+    gallery = []
+    for path, thumb in zip(paths, results):
+        if isinstance(thumb, Exception):
+            logger.warning(f"Thumbnail failed for {path}: {thumb}")
+            continue
+        if thumb is not None:
+            gallery.append((thumb, os.path.basename(path)))
+    if not gallery:
+        return f"No example images recorded for '{tag}'. Process the directory again to collect them.", []
+    return f"Examples for '{tag}'", gallery
 
-def export_to_file(tag_counts):
+def export_to_file(tag_counts, formats, min_count, top_n, lora_filter, split_categories, order):
     if not tag_counts:
         logger.warning("Export failed: No tags to export.")
-        return "No tags to export."
+        return "No tags to export.", None
     try:
-        os.makedirs("/data", exist_ok=True)
-        output_path = "/data/wildcard.txt"
-        logger.info(f"Exporting {len(tag_counts)} tags to {output_path}")
-        sorted_tags = sorted(tag_counts.keys())
-        with open(output_path, "w") as f:
-            f.write("\n".join(sorted_tags))
-        logger.info("Export successful.")
-        return f"Successfully exported to {output_path}"
+        output_dir = "/data"
+        paths = export_tags(
+            tag_counts, output_dir,
+            formats=formats or ['txt'],
+            min_count=int(min_count or 1),
+            top_n=int(top_n or 0) or None,
+            lora_filter=LORA_FILTER_CHOICES.get(lora_filter, 'all'),
+            split_categories=bool(split_categories),
+            order=EXPORT_ORDER_CHOICES.get(order)
+        )
+        if not paths:
+            logger.warning("Export produced no files: no tags matched the filters.")
+            return "No tags matched the export filters.", None
+        logger.info(f"Export successful: {paths}")
+        return f"Successfully exported to {', '.join(paths)}", paths
     except Exception as e:
         logger.error(f"Export failed: {e}")
-        return f"Export failed: {e}"
+        return f"Export failed: {e}", None
 
-def save_app_state(tag_counts):
+def save_app_state(tag_counts, timeline, examples, stats):
     if not tag_counts:
         logger.warning("Save state failed: No data to save.")
         return "No data to save."
@@ -146,6 +232,13 @@ def save_app_state(tag_counts):
         logger.info(f"Saving app state to {state_path}")
         with open(state_path, "w") as f:
             json.dump(tag_counts, f, indent=2)
+        # Time buckets are kept separately so state.json stays a plain {tag: count} map
+        with open(TIMELINE_PATH, "w") as f:
+            json.dump(timeline.to_dict(), f)
+        with open(EXAMPLES_PATH, "w") as f:
+            json.dump(examples, f)
+        with open(STATS_PATH, "w") as f:
+            json.dump(stats.to_dict(), f)
         logger.info("Save state successful.")
         return f"State saved to {state_path}"
     except Exception as e:
@@ -164,25 +257,41 @@ def load_app_state():
     state_path = "/data/state.json"
     if not os.path.exists(state_path):
         logger.warning(f"Load state failed: {state_path} does not exist.")
-        return {}, [], "", f"File not found: {state_path}"
+        return {}, TagTimeline(), {}, TagStatistics(), [], "", f"File not found: {state_path}"
     try:
         logger.info(f"Loading app state from {state_path}")
         with open(state_path, "r") as f:
             tag_counts = json.load(f)
 
+        timeline = TagTimeline()
+        if os.path.exists(TIMELINE_PATH):
+            with open(TIMELINE_PATH, "r") as f:
+                timeline = TagTimeline.from_dict(json.load(f))
+        examples = {}
+        if os.path.exists(EXAMPLES_PATH):
+            with open(EXAMPLES_PATH, "r") as f:
+                examples = json.load(f)
+        stats = TagStatistics()
+        if os.path.exists(STATS_PATH):
+            with open(STATS_PATH, "r") as f:
+                stats = TagStatistics.from_dict(json.load(f))
+
         sorted_tags = sorted(tag_counts.items(), key=lambda x: x[1], reverse=True)
-        df_data = [[False, tag, count] for tag, count in sorted_tags]
+        df_data = [[False, tag, count, tag] for tag, count in sorted_tags]
         preview = "\n".join([tag for tag, count in sorted_tags])
 
         logger.info("Load state successful.")
-        return tag_counts, df_data, preview, f"State loaded from {state_path}"
+        return tag_counts, timeline, examples, stats, df_data, preview, f"State loaded from {state_path}"
     except Exception as e:
         logger.error(f"Load state failed: {e}")
-        return {}, [], "", f"Load failed: {e}"
+        return {}, TagTimeline(), {}, TagStatistics(), [], "", f"Load failed: {e}"
 
 # UI Construction
 with gr.Blocks(title="SD Prompt Tag Aggregator") as demo:
     tag_counts_state = gr.State({})
+    timeline_state = gr.State(TagTimeline())
+    examples_state = gr.State({})
+    stats_state = gr.State(TagStatistics())
 
     gr.Markdown("## Stable Diffusion Prompt Tag Aggregator")
 
@@ -191,6 +300,7 @@ with gr.Blocks(title="SD Prompt Tag Aggregator") as demo:
         with gr.Row():
             path_input = gr.Textbox(label="Directory Path", value="/input", placeholder="/input/images", scale=4)
             process_btn = gr.Button("Process", variant="primary", scale=1)
+        dedup_input = gr.Checkbox(label="Skip duplicate images (count identical files once)", value=False)
 
         with gr.Row():
             active_path_display = gr.Markdown("Current active path: None")
@@ -199,9 +309,11 @@ with gr.Blocks(title="SD Prompt Tag Aggregator") as demo:
     with gr.Group():
         gr.Markdown("### Section B — Tag Table")
         tag_table = gr.Dataframe(
-            headers=["Select", "Tag", "Count"],
-            datatype=["bool", "str", "number"],
-            column_count=(3, "fixed"),
+            # Original Tag is read-only and identifies each row for inline edits, whatever the row order
+            headers=["Select", "Tag", "Count", "Original Tag"],
+            datatype=["bool", "str", "number", "str"],
+            column_count=(4, "fixed"),
+            static_columns=[3],
             type="array",
             interactive=True,
             label="Aggregate Tags (Edit tag text inline or use buttons below)"
@@ -213,9 +325,34 @@ with gr.Blocks(title="SD Prompt Tag Aggregator") as demo:
             merge_btn = gr.Button("Merge selected tags")
             delete_btn = gr.Button("Delete selected tags", variant="stop")
 
+        with gr.Row():
+            examples_btn = gr.Button("Show examples for selected tag", variant="secondary")
+            examples_status = gr.Markdown("")
+        examples_gallery = gr.Gallery(label="Example Images", columns=6, height="auto")
+
+        stats_btn = gr.Button("Show weight / position statistics", variant="secondary")
+        stats_table = gr.Dataframe(
+            headers=["Tag", "Count", "Mean Weight", "Min Weight", "Max Weight", "Mean Position", "Mean LoRA Weight"],
+            datatype=["str", "number", "number", "number", "number", "number", "number"],
+            type="array",
+            interactive=False,
+            label="Tag Statistics"
+        )
+
     with gr.Group():
         gr.Markdown("### Section C — Output & Persistence")
         preview_area = gr.TextArea(label="Wildcard List Preview", interactive=False, lines=10)
+        with gr.Row():
+            export_formats = gr.CheckboxGroup(
+                choices=list(EXPORT_FORMATS), value=["txt"],
+                label="Export Formats (txt = wildcard list, tsv = tag/count, yaml = Dynamic Prompts)"
+            )
+            export_lora_filter = gr.Radio(choices=list(LORA_FILTER_CHOICES), value="All tags", label="LoRA Filter")
+        with gr.Row():
+            export_min_count = gr.Number(label="Min Count", value=1, precision=0)
+            export_top_n = gr.Number(label="Top N (0 = all)", value=0, precision=0)
+            export_split = gr.Checkbox(label="One file per category (tags / lora)", value=False)
+            export_order = gr.Radio(choices=list(EXPORT_ORDER_CHOICES), value="Default (txt A-Z, tsv/yaml by count)", label="Line Order")
         with gr.Row():
             export_btn = gr.Button("Export Wildcard List", variant="primary")
             save_state_btn = gr.Button("Save State", variant="secondary")
@@ -223,66 +360,104 @@ with gr.Blocks(title="SD Prompt Tag Aggregator") as demo:
         with gr.Row():
             test_log_btn = gr.Button("Test Log Output", variant="secondary")
         export_status = gr.Markdown("")
+        export_files = gr.File(label="Download Export", file_count="multiple", interactive=False)
+
+    with gr.Group():
+        gr.Markdown("### Section D — Trends")
+        with gr.Row():
+            trend_start_input = gr.Textbox(label="Start Date", placeholder="YYYY-MM-DD (default: 7 days before end)")
+            trend_end_input = gr.Textbox(label="End Date", placeholder="YYYY-MM-DD (default: latest image)")
+            trends_btn = gr.Button("Show Trends", variant="secondary")
+        trend_status = gr.Markdown("")
+        with gr.Row():
+            trending_table = gr.Dataframe(
+                headers=["Tag", "Count", "Previous", "Change"],
+                datatype=["str", "number", "number", "number"],
+                type="array",
+                interactive=False,
+                label="Trending"
+            )
+            declining_table = gr.Dataframe(
+                headers=["Tag", "Count", "Previous", "Change"],
+                datatype=["str", "number", "number", "number"],
+                type="array",
+                interactive=False,
+                label="Declining"
+            )
 
     # Event Handlers
-    def on_process_click(path, progress=gr.Progress()):
-        act_path, img_count, df_data, preview, tag_counts = process_path(path, progress=progress)
-        return act_path, img_count, df_data, preview, tag_counts
+    def on_process_click(path, dedup, progress=gr.Progress()):
+        act_path, img_count, df_data, preview, tag_counts, timeline, examples, stats = process_path(path, dedup, progress=progress)
+        return act_path, img_count, df_data, preview, tag_counts, timeline, examples, stats
 
     process_btn.click(
         on_process_click,
-        inputs=[path_input],
-        outputs=[active_path_display, images_found_display, tag_table, preview_area, tag_counts_state]
+        inputs=[path_input, dedup_input],
+        outputs=[active_path_display, images_found_display, tag_table, preview_area, tag_counts_state, timeline_state, examples_state, stats_state]
     )
 
-    def on_table_edit(df_data):
-        preview, new_tag_counts = update_from_df(df_data)
-        return preview, new_tag_counts
-
     # Use input to update preview and state when table is edited
     tag_table.input(
-        on_table_edit,
-        inputs=[tag_table],
-        outputs=[preview_area, tag_counts_state]
+        update_from_df,
+        inputs=[tag_table, tag_counts_state, timeline_state, examples_state, stats_state],
+        outputs=[tag_table, preview_area, tag_counts_state, timeline_state, examples_state, stats_state]
     )
 
     delete_btn.click(
         handle_delete,
-        inputs=[tag_table, tag_counts_state],
-        outputs=[tag_table, preview_area, tag_counts_state]
+        inputs=[tag_table, tag_counts_state, timeline_state, examples_state, stats_state],
+        outputs=[tag_table, preview_area, tag_counts_state, timeline_state, examples_state, stats_state]
     )
 
     rename_btn.click(
         handle_rename,
-        inputs=[tag_table, tag_counts_state, new_name_input],
-        outputs=[tag_table, preview_area, tag_counts_state]
+        inputs=[tag_table, tag_counts_state, timeline_state, examples_state, stats_state, new_name_input],
+        outputs=[tag_table, preview_area, tag_counts_state, timeline_state, examples_state, stats_state]
     )
 
     merge_btn.click(
         handle_merge,
-        inputs=[tag_table, tag_counts_state, new_name_input],
-        outputs=[tag_table, preview_area, tag_counts_state]
+        inputs=[tag_table, tag_counts_state, timeline_state, examples_state, stats_state, new_name_input],
+        outputs=[tag_table, preview_area, tag_counts_state, timeline_state, examples_state, stats_state]
     )
 
     export_btn.click(
         export_to_file,
-        inputs=[tag_counts_state],
-        outputs=[export_status]
+        inputs=[tag_counts_state, export_formats, export_min_count, export_top_n, export_lora_filter, export_split, export_order],
+        outputs=[export_status, export_files]
     )
 
     save_state_btn.click(
         save_app_state,
-        inputs=[tag_counts_state],
+        inputs=[tag_counts_state, timeline_state, examples_state, stats_state],
         outputs=[export_status]
     )
 
     def on_load_click():
-        tag_counts, df_data, preview, status = load_app_state()
-        return tag_counts, df_data, preview, status
+        tag_counts, timeline, examples, stats, df_data, preview, status = load_app_state()
+        return tag_counts, timeline, examples, stats, df_data, preview, status
 
     load_state_btn.click(
         on_load_click,
-        outputs=[tag_counts_state, tag_table, preview_area, export_status]
+        outputs=[tag_counts_state, timeline_state, examples_state, stats_state, tag_table, preview_area, export_status]
+    )
+
+    stats_btn.click(
+        show_tag_stats,
+        inputs=[tag_counts_state, stats_state],
+        outputs=[stats_table]
+    )
+
+    examples_btn.click(
+        show_examples,
+        inputs=[tag_table, examples_state],
+        outputs=[examples_status, examples_gallery]
+    )
+
+    trends_btn.click(
+        show_trends,
+        inputs=[timeline_state, trend_start_input, trend_end_input],
+        outputs=[trend_status, trending_table, declining_table]
     )
 
     test_log_btn.click(
@@ -302,4 +477,11 @@ if __name__ == "__main__":
     logger.info("Output volume mount expected at: /data")
     logger.info("Python version: " + sys.version)
 
-    demo.launch(server_name=SERVER_NAME, server_port=PORT)
+    logger.info(f"Automation API available at http://{SERVER_NAME}:{PORT}/api/v1 (scan concurrency {api.SCAN_CONCURRENCY})")
+
+    # Serve the JSON API and the Gradio UI from one server
+    server = FastAPI(title="SD Prompt Tag Aggregator")
+    server.include_router(api.router)
+    # /data must be allowed for export downloads to be served
+    server = gr.mount_gradio_app(server, demo, path="/", allowed_paths=["/data"])
+    uvicorn.run(server, host=SERVER_NAME, port=PORT)
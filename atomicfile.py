@@ -0,0 +1,32 @@
+import os
+import tempfile
+
+class AtomicFile:
+    """
+    A text file written next to path and moved into place on commit, so
+    readers never see a partial file. As a context manager it yields the
+    open file, committing on success and discarding the temp file on error.
+    """
+    def __init__(self, path, prefix=".tmp-"):
+        self.path = path
+        fd, self.tmp_path = tempfile.mkstemp(dir=os.path.dirname(path) or ".", prefix=prefix)
+        os.chmod(self.tmp_path, 0o644)  # mkstemp creates owner-only files
+        self.file = os.fdopen(fd, "w", encoding="utf-8")
+
+    def commit(self):
+        self.file.close()
+        os.replace(self.tmp_path, self.path)
+
+    def abort(self):
+        self.file.close()
+        if os.path.exists(self.tmp_path):
+            os.remove(self.tmp_path)
+
+    def __enter__(self):
+        return self.file
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.commit()
+        else:
+            self.abort()
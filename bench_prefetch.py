@@ -0,0 +1,84 @@
+import io
+import os
+import sys
+import time
+import tempfile
+import piexif
+from PIL import Image
+from PIL.PngImagePlugin import PngInfo
+
+from loader import extract_prompt, get_image_files_generator
+from prefetch import prefetch_metadata
+
+# Simulated round trip of a network share (per open and per read call)
+LATENCY = float(sys.argv[1]) if len(sys.argv) > 1 else 0.005
+NUM_IMAGES = 60
+
+class SlowRawFile(io.FileIO):
+    """Local stand-in for a file on a network mount: every read pays LATENCY."""
+    def __init__(self, path):
+        time.sleep(LATENCY)
+        super().__init__(path, 'r')
+
+    def read(self, size=-1):
+        time.sleep(LATENCY)
+        return super().read(size)
+
+    def readall(self):
+        time.sleep(LATENCY)
+        return super().readall()
+
+    def readinto(self, b):
+        time.sleep(LATENCY)
+        return super().readinto(b)
+
+def slow_open(path, mode='rb'):
+    # Buffered like the builtin open(), so small reads are batched the same way
+    return io.BufferedReader(SlowRawFile(path))
+
+def create_images(directory):
+    params = "masterpiece, best quality, 1girl, {i}\nNegative prompt: lowres, bad anatomy\nSteps: 20"
+    for i in range(NUM_IMAGES):
+        img = Image.effect_noise((512, 512), 64).convert('RGB')
+        kind = i % 3
+        if kind == 0:
+            info = PngInfo()
+            info.add_text("parameters", params.format(i=i))
+            img.save(os.path.join(directory, f"{i:04d}.png"), pnginfo=info)
+        else:
+            exif = {"Exif": {piexif.ExifIFD.UserComment: b'UNICODE\x00' + params.format(i=i).encode('utf-16le')}}
+            ext = "jpg" if kind == 1 else "webp"
+            img.save(os.path.join(directory, f"{i:04d}.{ext}"), exif=piexif.dump(exif))
+
+def bench_sequential(files):
+    results = []
+    for f in files:
+        with slow_open(f) as fp:
+            results.append(extract_prompt(fp))
+    return results
+
+def bench_prefetch(files):
+    return [extract_prompt(f.path, f.data) for f in prefetch_metadata(files, opener=slow_open)]
+
+def main():
+    with tempfile.TemporaryDirectory() as directory:
+        create_images(directory)
+        files = sorted(get_image_files_generator(directory))
+        print(f"{len(files)} images, {LATENCY * 1000:.1f} ms simulated latency per I/O call")
+
+        start = time.perf_counter()
+        sequential = bench_sequential(files)
+        t_seq = time.perf_counter() - start
+        print(f"Sequential Image.open: {t_seq:.2f}s")
+
+        start = time.perf_counter()
+        prefetched = bench_prefetch(files)
+        t_pre = time.perf_counter() - start
+        print(f"Prefetch pipeline:     {t_pre:.2f}s ({t_seq / t_pre:.1f}x)")
+
+        assert sequential == prefetched, "Prefetched extraction differs from sequential extraction"
+        assert all(sequential), "Some prompts were not extracted"
+        print("Results identical.")
+
+if __name__ == "__main__":
+    main()
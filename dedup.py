@@ -0,0 +1,178 @@
+import os
+import json
+import hashlib
+import logging
+import threading
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from prefetch import PREFETCH_WORKERS
+from atomicfile import AtomicFile
+
+logger = logging.getLogger(__name__)
+
+# Persistent hash cache, override to keep scans of scratch trees out of /data
+HASH_CACHE_PATH = os.environ.get("HASH_CACHE_PATH", "/data/hash_cache.json")
+# Bytes hashed from each end of a file for the partial hash
+PARTIAL_HASH_BYTES = 64 * 1024
+HASH_CHUNK_SIZE = 1024 * 1024
+
+def _digest():
+    return hashlib.blake2b(digest_size=16)
+
+def partial_hash(path, size):
+    """Hashes the first and last PARTIAL_HASH_BYTES of a file (the whole file if it is small)."""
+    h = _digest()
+    with open(path, 'rb') as f:
+        h.update(f.read(PARTIAL_HASH_BYTES))
+        if size > 2 * PARTIAL_HASH_BYTES:
+            f.seek(-PARTIAL_HASH_BYTES, os.SEEK_END)
+            h.update(f.read(PARTIAL_HASH_BYTES))
+        elif size > PARTIAL_HASH_BYTES:
+            h.update(f.read())
+    return h.hexdigest()
+
+def full_hash(path):
+    h = _digest()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b''):
+            h.update(chunk)
+    return h.hexdigest()
+
+class HashCache:
+    """
+    Persistent cache of file hashes keyed by path, valid while the file's
+    size and mtime are unchanged. Stored as {path: [size, mtime_ns, partial, full]}.
+    """
+    def __init__(self, path=HASH_CACHE_PATH):
+        self.path = path
+        self.entries = {}
+        self.lock = threading.Lock()
+        self.dirty = False
+        if os.path.exists(path):
+            try:
+                with open(path, "r") as f:
+                    self.entries = json.load(f)
+            except Exception as e:
+                logger.warning(f"Ignoring unreadable hash cache {path}: {e}")
+
+    def get(self, path, size, mtime_ns, kind):
+        """Returns the cached 'partial' or 'full' hash, or None."""
+        entry = self.entries.get(path)
+        if entry and entry[0] == size and entry[1] == mtime_ns:
+            return entry[2] if kind == 'partial' else entry[3]
+        return None
+
+    def put(self, path, size, mtime_ns, kind, digest):
+        with self.lock:
+            entry = self.entries.get(path)
+            if not entry or entry[0] != size or entry[1] != mtime_ns:
+                entry = self.entries[path] = [size, mtime_ns, None, None]
+            entry[2 if kind == 'partial' else 3] = digest
+            self.dirty = True
+
+    def prune(self, root, paths):
+        """Drops entries under root that are not in paths (files deleted since the last scan)."""
+        prefix = os.path.join(root, "")
+        seen = set(paths)
+        with self.lock:
+            stale = [p for p in self.entries if p.startswith(prefix) and p not in seen]
+            for path in stale:
+                del self.entries[path]
+            self.dirty = self.dirty or bool(stale)
+
+    def save(self):
+        if not self.dirty:
+            return
+        directory = os.path.dirname(self.path) or "."
+        os.makedirs(directory, exist_ok=True)
+        with self.lock:
+            with AtomicFile(self.path, prefix=".hash-cache-") as f:
+                json.dump(self.entries, f)
+            self.dirty = False
+
+def stat_files(paths, workers=PREFETCH_WORKERS):
+    """Returns [(path, size, mtime_ns)], stat'ing concurrently; unreadable files are skipped."""
+    def stat(path):
+        try:
+            st = os.stat(path)
+            return path, st.st_size, st.st_mtime_ns
+        except OSError as e:
+            logger.warning(f"Cannot stat {path}: {e}")
+            return None
+
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="dedup") as pool:
+        return [f for f in pool.map(stat, paths) if f]
+
+def _hash_all(files, kind, cache, pool):
+    """Returns {path: digest} for [(path, size, mtime_ns)], using and filling the cache."""
+    digests = {}
+    missing = []
+    for path, size, mtime_ns in files:
+        digest = cache.get(path, size, mtime_ns, kind) if cache else None
+        if digest:
+            digests[path] = digest
+        else:
+            missing.append((path, size, mtime_ns))
+
+    def compute(file):
+        path, size, mtime_ns = file
+        try:
+            digest = partial_hash(path, size) if kind == 'partial' else full_hash(path)
+        except OSError as e:
+            logger.warning(f"Cannot hash {path}: {e}")
+            return path, None
+        if cache:
+            cache.put(path, size, mtime_ns, kind, digest)
+        return path, digest
+
+    for path, digest in pool.map(compute, missing):
+        if digest:
+            digests[path] = digest
+    return digests
+
+def _collisions(groups):
+    return [group for group in groups.values() if len(group) > 1]
+
+def find_duplicates(files, cache=None, workers=PREFETCH_WORKERS):
+    """
+    Returns the set of paths whose content duplicates another file.
+    files is [(path, size, mtime_ns)]. Only files sharing a size get a
+    partial (head + tail) hash and only partial collisions get a full hash,
+    so unique files are never read. The lexicographically first path of
+    each duplicate group is kept.
+    """
+    by_size = defaultdict(list)
+    for file in files:
+        by_size[file[1]].append(file)
+    same_size = [f for group in _collisions(by_size) for f in group]
+    if not same_size:
+        return set()
+
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="dedup") as pool:
+        partial = _hash_all(same_size, 'partial', cache, pool)
+        by_partial = defaultdict(list)
+        for file in same_size:
+            if file[0] in partial:
+                by_partial[(file[1], partial[file[0]])].append(file)
+
+        # Small files were hashed completely by the partial hash already
+        by_content = defaultdict(list)
+        need_full = []
+        for group in _collisions(by_partial):
+            if group[0][1] <= 2 * PARTIAL_HASH_BYTES:
+                by_content[('partial', partial[group[0][0]])].extend(group)
+            else:
+                need_full.extend(group)
+        full = _hash_all(need_full, 'full', cache, pool)
+        for file in need_full:
+            if file[0] in full:
+                by_content[('full', full[file[0]])].append(file)
+
+    duplicates = set()
+    for group in _collisions(by_content):
+        duplicates.update(sorted(path for path, _, _ in group)[1:])
+    logger.info(
+        f"Dedup: {len(same_size)} files share a size, {len(need_full)} needed a full hash, "
+        f"{len(duplicates)} duplicates found"
+    )
+    return duplicates
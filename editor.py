@@ -40,3 +40,70 @@ def merge_tags(tag_dict, tags_to_merge, target_name):
     else:
         new_dict[target_name] = total_count
     return new_dict
+
+def merge_examples(examples, tags_to_merge, target_name, limit):
+    """Merges the example image lists of tags into target_name, keeping at most limit paths."""
+    if not target_name or not tags_to_merge:
+        return examples
+
+    new_examples = examples.copy()
+    paths = list(new_examples.pop(target_name, []))
+    for tag in tags_to_merge:
+        for path in new_examples.pop(tag, []):
+            if len(paths) < limit and path not in paths:
+                paths.append(path)
+    if paths:
+        new_examples[target_name] = paths
+    return new_examples
+
+def apply_edit(tag_counts, timeline, examples, op, tags, target=None, examples_limit=6, stats=None):
+    """
+    Applies a delete, rename or merge to the tag counts, the timeline and
+    weight statistics (in place) and the per-tag example images, keeping them consistent.
+    Returns the new (tag_counts, examples).
+    """
+    if op == 'delete':
+        timeline.delete(tags)
+        if stats is not None:
+            stats.delete(tags)
+        return delete_tags(tag_counts, tags), delete_tags(examples, tags)
+
+    if op == 'rename':
+        if len(tags) != 1:
+            raise ValueError("Rename requires exactly one tag.")
+        new_tag_counts = rename_tag(tag_counts, tags[0], target)
+    elif op == 'merge':
+        new_tag_counts = merge_tags(tag_counts, tags, target)
+    else:
+        raise ValueError(f"Unknown edit operation: {op}")
+
+    if target:
+        timeline.merge(tags, target)
+        if stats is not None:
+            stats.merge(tags, target)
+        examples = merge_examples(examples, tags, target, examples_limit)
+    return new_tag_counts, examples
+
+def table_edits(old_tags, rows):
+    """
+    Works out the edits implied by an inline-edited table.
+    rows are (key, tag) pairs, where key is the tag the row was rendered
+    from (None for rows added in the UI), so row order doesn't matter.
+    Returns [(op, tags, target)]: rows that were removed or cleared are
+    deletes, changed rows are renames (merging into an existing tag of
+    that name). Deletes come first, so a tag cleared and reused by a rename
+    in the same edit keeps only the renamed data.
+    """
+    old_tags = set(old_tags)
+    keys = {key for key, _ in rows if key}
+    deletes = [tag for tag in old_tags - keys]
+    renames = []
+    for key, tag in rows:
+        if key not in old_tags or key == tag:
+            continue
+        if tag:
+            renames.append(('rename', [key], tag))
+        else:
+            deletes.append(key)
+    edits = [('delete', sorted(deletes), None)] if deletes else []
+    return edits + renames
@@ -0,0 +1,122 @@
+import os
+import json
+import heapq
+import logging
+from atomicfile import AtomicFile
+
+logger = logging.getLogger(__name__)
+
+EXPORT_FORMATS = ('txt', 'tsv', 'yaml')
+LORA_FILTERS = ('all', 'lora', 'no_lora')
+EXPORT_ORDERS = ('alpha', 'count')
+# Line order per format when none is requested: wildcard.txt stays alphabetical as it always was
+DEFAULT_ORDERS = {'txt': 'alpha', 'tsv': 'count', 'yaml': 'count'}
+
+# Lines buffered per file before hitting the disk
+CHUNK_SIZE = 1000
+
+def is_lora(tag):
+    return tag.startswith('<lora:')
+
+def tag_category(tag):
+    """Category used for per-category export files."""
+    return 'lora' if is_lora(tag) else 'tags'
+
+def select_tags(tag_counts, min_count=1, top_n=None, lora_filter='all'):
+    """
+    Applies thresholds and the LoRA filter, returning (tag, count) pairs
+    ordered by count descending, then tag. The vocabulary is sorted once
+    (or only the top N are selected via a heap) and shared by every format.
+    """
+    if lora_filter not in LORA_FILTERS:
+        raise ValueError(f"Unknown LoRA filter: {lora_filter}")
+
+    items = (
+        (tag, count) for tag, count in tag_counts.items()
+        if count >= min_count
+        and (lora_filter == 'all' or is_lora(tag) == (lora_filter == 'lora'))
+    )
+    key = lambda x: (-x[1], x[0])
+    if top_n:
+        return heapq.nsmallest(top_n, items, key=key)
+    return sorted(items, key=key)
+
+class _ChunkedWriter:
+    """Writes lines to a temp file in chunks and atomically moves it into place on commit."""
+    def __init__(self, path, header=None):
+        self.path = path
+        self.target = AtomicFile(path, prefix=".export-")
+        self.buffer = [header] if header else []
+
+    def write(self, line):
+        self.buffer.append(line)
+        if len(self.buffer) >= CHUNK_SIZE:
+            self.flush()
+
+    def flush(self):
+        if self.buffer:
+            self.target.file.write("\n".join(self.buffer) + "\n")
+            self.buffer = []
+
+    def commit(self):
+        self.flush()
+        self.target.commit()
+
+    def abort(self):
+        self.target.abort()
+
+def _format_line(fmt, tag, count):
+    if fmt == 'tsv':
+        return f"{tag}\t{count}"
+    if fmt == 'yaml':
+        # JSON strings are valid double-quoted YAML scalars
+        return f"  - {json.dumps(tag, ensure_ascii=False)}"
+    return tag
+
+def export_tags(tag_counts, output_dir, basename="wildcard", formats=('txt',),
+                min_count=1, top_n=None, lora_filter='all', split_categories=False, order=None):
+    """
+    Exports tags to one file per format (and per category if split_categories)
+    in a single pass over the selected tags per line order.
+    order is 'alpha' or 'count' for all formats, or None for DEFAULT_ORDERS.
+    Files are written atomically. Returns the list of written paths.
+    """
+    formats = [f for f in EXPORT_FORMATS if f in formats]
+    if not formats:
+        raise ValueError("No export format selected")
+    if order is not None and order not in EXPORT_ORDERS:
+        raise ValueError(f"Unknown export order: {order}")
+
+    selected = select_tags(tag_counts, min_count, top_n, lora_filter)
+    logger.info(f"Exporting {len(selected)} of {len(tag_counts)} tags as {', '.join(formats)}")
+
+    os.makedirs(output_dir, exist_ok=True)
+    writers = {}
+
+    def writer_for(fmt, category):
+        key = (fmt, category)
+        if key not in writers:
+            name = f"{basename}_{category}" if category else basename
+            header = f"{name}:" if fmt == 'yaml' else None
+            writers[key] = _ChunkedWriter(os.path.join(output_dir, f"{name}.{fmt}"), header)
+        return writers[key]
+
+    orders = {}
+    for fmt in formats:
+        orders.setdefault(order or DEFAULT_ORDERS[fmt], []).append(fmt)
+
+    try:
+        for line_order, order_formats in orders.items():
+            rows = sorted(selected) if line_order == 'alpha' else selected
+            for tag, count in rows:
+                category = tag_category(tag) if split_categories else None
+                for fmt in order_formats:
+                    writer_for(fmt, category).write(_format_line(fmt, tag, count))
+        for writer in writers.values():
+            writer.commit()
+    except Exception:
+        for writer in writers.values():
+            writer.abort()
+        raise
+
+    return [writer.path for writer in writers.values()]
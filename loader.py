@@ -1,6 +1,9 @@
 import os
+import io
 import logging
 import re
+import json
+from datetime import datetime
 import piexif
 import piexif.helper
 from PIL import Image
@@ -32,6 +35,22 @@ def is_likely_negative(text):
     # If it contains many negative keywords, it's likely negative
     return match_count >= 2
 
+# Printable ASCII (32-126) plus newline/tab, removed to count them in one pass
+PRINTABLE_ASCII_DELETE_TABLE = dict.fromkeys([*range(32, 127), *map(ord, '\n\r\t')])
+
+def detect_utf16_byte_order(payload):
+    """
+    Guesses the byte order of a UTF-16 payload without decoding it.
+    ASCII text in UTF-16LE has its zero (high) bytes at odd offsets and in
+    UTF-16BE at even offsets, so counting zeros in each half picks the encoding.
+    """
+    if payload.startswith((b'\xff\xfe', b'\xfe\xff')):
+        return 'utf-16'  # explicit BOM
+    zeros_even = payload[0::2].count(0)
+    zeros_odd = payload[1::2].count(0)
+    # Ties (e.g. no ASCII at all) keep the historical little-endian preference
+    return 'utf-16be' if zeros_even > zeros_odd else 'utf-16le'
+
 def decode_exif_user_comment(user_comment):
     """
     Decodes the UserComment field from EXIF data using smart heuristics.
@@ -49,33 +68,22 @@ def decode_exif_user_comment(user_comment):
             # 1. Handle UNICODE prefix
             if user_comment.startswith(b'UNICODE\x00'):
                 payload = user_comment[8:]
-                
-                # Try both LE and BE, pick the one that looks like English/ASCII
+
+                # Pick LE vs BE from the bytes, then decode only once.
                 # This works because A1111 prompts are mostly ASCII + English punctuation
-                candidates = []
-                for enc in ['utf-16le', 'utf-16be', 'utf-16']:
-                    try:
-                        decoded = payload.decode(enc)
-                        # Score: Count printable ASCII/English chars
-                        # Count standard printable ASCII (32-126) and newline/tab
-                        # Mojibake will be mostly >127
-                        score = sum(1 for c in decoded if 32 <= ord(c) <= 126 or c in '\n\r\t')
-                        candidates.append((score, decoded))
-                        # If almost perfect ASCII score, we can stop early
-                        if score > len(payload)/2 * 0.9: # UTF-16 is 2 bytes per char
-                             return decoded.strip()
-                    except:
-                        pass
-                
-                if candidates:
-                    # Return the one with the highest ASCII score
-                    candidates.sort(key=lambda x: x[0], reverse=True)
-                    best_score, best_decoded = candidates[0]
-                    # Log if it was confusing (e.g. low score)
-                    if best_decoded and best_score < len(best_decoded) * 0.5:
-                         logger.warning(f"Low confidence decode ({best_score}/{len(best_decoded)} ASCII chars): {best_decoded[:30]}...")
-                    return best_decoded.strip()
-            
+                encoding = detect_utf16_byte_order(payload)
+                try:
+                    decoded = payload.decode(encoding)
+                except UnicodeDecodeError:
+                    decoded = None
+
+                if decoded is not None:
+                    # Log if it was confusing (e.g. few ASCII chars, Mojibake will be mostly >127)
+                    score = len(decoded) - len(decoded.translate(PRINTABLE_ASCII_DELETE_TABLE))
+                    if decoded and score < len(decoded) * 0.5:
+                         logger.warning(f"Low confidence decode ({score}/{len(decoded)} ASCII chars): {decoded[:30]}...")
+                    return decoded.strip()
+
             # 2. Handle ASCII prefix or raw
             if user_comment.startswith(b'ASCII\x00\x00\x00'):
                 return user_comment[8:].decode('utf-8', errors='ignore').strip()
@@ -123,51 +131,199 @@ def extract_a1111_params(param_str):
         
     return prompt.strip()
 
-def extract_prompt(image_path):
+# ComfyUI node inputs that hold prompt text on text encoder nodes
+COMFYUI_TEXT_INPUTS = ('text', 'text_g', 'text_l', 'clip_l', 't5xxl')
+# Inputs of string source nodes (primitives, text boxes) linked into a text input
+COMFYUI_STRING_INPUTS = ('text', 'string', 'value', 'Text')
+def _is_link(value):
+    # Links in the API-format graph are [source_node_id, output_index]
+    return isinstance(value, list) and len(value) == 2 and isinstance(value[0], str) and isinstance(value[1], int)
+
+def _resolve_string_source(graph, node_id, input_name, seen):
+    """Follows a text input to the (node_id, input_name) holding its string literal."""
+    while (node_id, input_name) not in seen:
+        seen.add((node_id, input_name))
+        value = graph.get(node_id, {}).get('inputs', {}).get(input_name)
+        if isinstance(value, str):
+            return node_id, input_name
+        if not _is_link(value):
+            return None
+        node_id = value[0]
+        inputs = graph.get(node_id, {}).get('inputs', {})
+        input_name = next((n for n in COMFYUI_STRING_INPUTS if n in inputs), None)
+        if input_name is None:
+            return None
+    return None
+
+def _resolve_conditioning(graph, link, locations, seen):
+    """Walks a conditioning link upstream, collecting text locations of the encoders it comes from."""
+    node_id, output_index = link
+    if (node_id, output_index) in seen or node_id not in graph:
+        return
+    seen.add((node_id, output_index))
+    node = graph[node_id]
+    inputs = node.get('inputs', {})
+
+    if 'TextEncode' in node.get('class_type', ''):
+        for name in COMFYUI_TEXT_INPUTS:
+            if name in inputs:
+                location = _resolve_string_source(graph, node_id, name, set())
+                if location and location not in locations:
+                    locations.append(location)
+        return
+
+    # Nodes passing both conditionings through (e.g. ControlNetApplyAdvanced)
+    # output positive at index 0 and negative at index 1
+    if 'positive' in inputs and 'negative' in inputs:
+        upstream = ['positive' if output_index == 0 else 'negative']
+    else:
+        upstream = [n for n in inputs if n.startswith('conditioning') or n == 'positive']
+    for name in upstream:
+        if _is_link(inputs.get(name)):
+            _resolve_conditioning(graph, inputs[name], locations, seen)
+
+def resolve_comfyui_positive(graph):
+    """
+    Returns the (node_id, input_name) locations of the positive prompt text,
+    found by following sampler/guider `positive` links back to text encoders.
+    Returns None if the graph has no sampler or guider.
+    """
+    locations = []
+    seen = set()
+    found_sampler = False
+    for node_id in sorted(graph):
+        node = graph[node_id]
+        class_type = node.get('class_type', '')
+        if 'Sampler' not in class_type and 'Guider' not in class_type:
+            continue
+        found_sampler = True
+        inputs = node.get('inputs', {})
+        link = inputs.get('positive', inputs.get('conditioning'))
+        if _is_link(link):
+            _resolve_conditioning(graph, link, locations, seen)
+    return locations if found_sampler else None
+
+def extract_comfyui_prompt(prompt_json):
+    """
+    Extracts the positive prompt from a ComfyUI API-format `prompt` graph.
+    Returns None if the data is not a ComfyUI graph.
+    """
+    try:
+        graph = json.loads(prompt_json)
+    except (TypeError, ValueError):
+        return None
+    if not isinstance(graph, dict) or not all(isinstance(n, dict) for n in graph.values()):
+        return None
+
+    locations = resolve_comfyui_positive(graph)
+    if locations is not None:
+        texts = [graph[node_id]['inputs'][name] for node_id, name in locations]
+    else:
+        # No sampler to follow (partial graphs): fall back to encoder texts that don't look negative
+        texts = [
+            inputs[name]
+            for node in graph.values() if 'TextEncode' in node.get('class_type', '')
+            for inputs in [node.get('inputs', {})]
+            for name in COMFYUI_TEXT_INPUTS
+            if isinstance(inputs.get(name), str) and not is_likely_negative(inputs[name])
+        ]
+
+    # SDXL encoders often repeat the same text in text_g and text_l
+    unique = []
+    for text in texts:
+        text = text.strip()
+        if text and text not in unique:
+            unique.append(text)
+    return ", ".join(unique)
+
+def open_image(image_path, data=None):
+    """
+    Opens an image lazily. If `data` holds the file's metadata bytes
+    (see prefetch.read_metadata_bytes), it is parsed from memory instead of
+    reopening the file.
+    """
+    return Image.open(io.BytesIO(data) if data is not None else image_path)
+
+def extract_prompt(image_path, data=None):
     """
     Robustly extracts ONLY the positive prompt from image metadata.
     Strictly focuses on A1111 format using PNGInfo or EXIF UserComment via piexif.
     """
     try:
-        img = Image.open(image_path)
-        
-        # Strategy 1: PNG Info (parameters key)
-        # Usage: PNG, WebP
-        if img.info and 'parameters' in img.info:
-            return extract_a1111_params(img.info['parameters'])
-            
-        # Strategy 2: EXIF UserComment via piexif
-        # Usage: JPEG, WebP (sometimes)
-        if 'exif' in img.info:
-            try:
-                exif_dict = piexif.load(img.info['exif'])
-                # 0x9286 is UserComment
-                if piexif.ExifIFD.UserComment in exif_dict.get('Exif', {}):
-                    user_comment = exif_dict['Exif'][piexif.ExifIFD.UserComment]
-                    decoded_comment = decode_exif_user_comment(user_comment)
-                    if decoded_comment:
-                        return extract_a1111_params(decoded_comment)
-            except Exception:
-                pass
+        return extract_prompt_from_image(open_image(image_path, data))
+    except Exception as e:
+        logger.error(f"Error extracting prompt from {image_path}: {e}")
+        return ""
+
+def extract_metadata(image_path, data=None):
+    """
+    Extracts the positive prompt and the generation date with a single open.
+    Returns (prompt, date or None).
+    """
+    try:
+        img = open_image(image_path, data)
+        return extract_prompt_from_image(img), extract_generation_date(img)
+    except Exception as e:
+        logger.error(f"Error extracting prompt from {image_path}: {e}")
+        return "", None
 
-        # Strategy 3: Fallback standard Image.getexif for JPEGs if piexif fail/not used
-        # (Though piexif handles most, sometimes PIL's getexif is simpler for base tags)
-        # 0x9286 = 37510 = UserComment
+def extract_generation_date(img):
+    """Returns the EXIF DateTimeOriginal (or DateTime) of an opened image as a date, or None."""
+    # PNG getexif() decodes the image data looking for trailing EXIF, only use embedded EXIF
+    if 'exif' not in img.info:
+        return None
+    try:
         exif = img.getexif()
-        if exif:
-            # check for UserComment
-            if 37510 in exif:
-                return extract_a1111_params(decode_exif_user_comment(exif[37510]))
-            
-            # check for ImageDescription (0x010e = 270) - some tools put params there
-            if 270 in exif:
-                 return extract_a1111_params(str(exif[270]))
+        # 0x8769 = Exif IFD, 0x9003 = DateTimeOriginal, 0x0132 = DateTime
+        value = exif.get_ifd(0x8769).get(0x9003) or exif.get(0x0132)
+        if value:
+            return datetime.strptime(str(value).strip('\x00 '), '%Y:%m:%d %H:%M:%S').date()
+    except Exception:
+        pass
+    return None
 
-        return ""
+def extract_prompt_from_image(img):
+    """Runs the prompt extraction strategies on an opened image."""
+    # Strategy 1: PNG Info (parameters key)
+    # Usage: PNG, WebP
+    if img.info and 'parameters' in img.info:
+        return extract_a1111_params(img.info['parameters'])
+
+    # Strategy 1b: ComfyUI API graph (prompt key)
+    # Usage: PNG written by ComfyUI's SaveImage
+    if img.info and 'prompt' in img.info:
+        prompt = extract_comfyui_prompt(img.info['prompt'])
+        if prompt is not None:
+            return prompt
         
-    except Exception as e:
-        logger.error(f"Error extracting prompt from {image_path}: {e}")
-        return ""
+    # Strategy 2: EXIF UserComment via piexif
+    # Usage: JPEG, WebP (sometimes)
+    if 'exif' in img.info:
+        try:
+            exif_dict = piexif.load(img.info['exif'])
+            # 0x9286 is UserComment
+            if piexif.ExifIFD.UserComment in exif_dict.get('Exif', {}):
+                user_comment = exif_dict['Exif'][piexif.ExifIFD.UserComment]
+                decoded_comment = decode_exif_user_comment(user_comment)
+                if decoded_comment:
+                    return extract_a1111_params(decoded_comment)
+        except Exception:
+            pass
+
+    # Strategy 3: Fallback standard Image.getexif for JPEGs if piexif fail/not used
+    # (Though piexif handles most, sometimes PIL's getexif is simpler for base tags)
+    # 0x9286 = 37510 = UserComment
+    exif = img.getexif()
+    if exif:
+        # check for UserComment
+        if 37510 in exif:
+            return extract_a1111_params(decode_exif_user_comment(exif[37510]))
+        
+        # check for ImageDescription (0x010e = 270) - some tools put params there
+        if 270 in exif:
+             return extract_a1111_params(str(exif[270]))
+
+    return ""
 
 def get_image_files_generator(directory):
     """Yields supported image files in the directory recursively (lazy iteration)."""
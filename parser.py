@@ -1,6 +1,7 @@
 import re
 import logging
 import string
+from collections import namedtuple
 
 logger = logging.getLogger(__name__)
 
@@ -12,14 +13,62 @@ PARAMETER_PREFIXES = [
     'hashes:', 'template:', 'negative prompt:'
 ]
 
+class _PrintableTable(dict):
+    """
+    str.translate table that deletes non-printable characters.
+    Entries are filled in (and cached) on first sight of each code point, so
+    cleaning runs at C speed without precomputing the whole Unicode range.
+    """
+    def __init__(self, keep=""):
+        super().__init__()
+        self.keep = keep
+
+    def __missing__(self, codepoint):
+        c = chr(codepoint)
+        value = codepoint if c.isprintable() or c in self.keep else None
+        self[codepoint] = value
+        return value
+
+# Deletes control characters (space is printable and kept)
+CLEAN_TABLE = _PrintableTable()
+# Same, but also keeps newlines and tabs
+PRINTABLE_WHITESPACE_TABLE = _PrintableTable(keep="\n\r\t")
+
+# Structured tag from parse_prompt(structured=True):
+# weight is the effective emphasis weight, position the index among the prompt's tags,
+# lora_weight the <lora:name:weight> multiplier (None for non-LoRA tags)
+PromptToken = namedtuple('PromptToken', ['tag', 'weight', 'position', 'lora_weight'])
+
+# Stable Diffusion emphasis syntax, same tokenization as A1111's prompt parser
+RE_ATTENTION = re.compile(r"""
+\\\(|
+\\\)|
+\\\[|
+\\]|
+\\\\|
+\\|
+\(|
+\[|
+:\s*([+-]?[.\d]+)\s*\)|
+\)|
+]|
+[^\\()\[\]:]+|
+:
+""", re.X)
+
+RE_LORA_WEIGHT = re.compile(r'^<lora:[^:>]*:\s*([+-]?[\d.]+)')
+
+ROUND_BRACKET_MULTIPLIER = 1.1
+SQUARE_BRACKET_MULTIPLIER = 1 / 1.1
+
 def is_printable(s):
     """Checks if a string consists mostly of printable characters."""
     if not s:
         return True
     # Count printable characters. ord(c) > 127 handles common unicode like emojis or accented chars
     # but we want to avoid control characters.
-    printable = sum(1 for c in s if c.isprintable() or c in "\n\r\t")
-    return (printable / len(s)) > 0.9 if len(s) > 0 else True
+    printable = len(s.translate(PRINTABLE_WHITESPACE_TABLE))
+    return (printable / len(s)) > 0.9
 
 def clean_text(text):
     """Removes non-printable control characters from text."""
@@ -27,7 +76,7 @@ def clean_text(text):
         return ""
     # Remove control characters except for common ones like newline, tab
     # We use isprintable() which is built-in and handles unicode correctly
-    return "".join(c for c in text if c.isprintable() or c in " ")
+    return text.translate(CLEAN_TABLE)
 
 def normalize_tag(tag):
     """
@@ -72,10 +121,82 @@ def normalize_tag(tag):
 
     return tag.strip()
 
-def parse_prompt(prompt):
+def parse_attention(prompt):
+    """
+    Splits a prompt into [text, weight] chunks following SD emphasis rules:
+    (x) multiplies by 1.1, [x] divides by 1.1, (x:1.3) sets the multiplier.
+    Brackets may span commas and nest; unclosed brackets apply to the rest.
+    """
+    res = []
+    round_brackets = []
+    square_brackets = []
+
+    def multiply_range(start, multiplier):
+        for p in range(start, len(res)):
+            res[p][1] *= multiplier
+
+    for m in RE_ATTENTION.finditer(prompt):
+        text = m.group(0)
+        weight = m.group(1)
+
+        if text.startswith('\\'):
+            res.append([text[1:], 1.0])
+        elif text == '(':
+            round_brackets.append(len(res))
+        elif text == '[':
+            square_brackets.append(len(res))
+        elif weight is not None and round_brackets:
+            try:
+                multiply_range(round_brackets.pop(), float(weight))
+            except ValueError:
+                pass  # e.g. "(tag:1.2.3)"
+        elif text == ')' and round_brackets:
+            multiply_range(round_brackets.pop(), ROUND_BRACKET_MULTIPLIER)
+        elif text == ']' and square_brackets:
+            multiply_range(square_brackets.pop(), SQUARE_BRACKET_MULTIPLIER)
+        else:
+            res.append([text, 1.0])
+
+    for pos in round_brackets:
+        multiply_range(pos, ROUND_BRACKET_MULTIPLIER)
+    for pos in square_brackets:
+        multiply_range(pos, SQUARE_BRACKET_MULTIPLIER)
+    return res
+
+def segment_weights(prompt):
+    """
+    Returns the emphasis weight of each comma-separated segment, aligned with
+    prompt.split(','). Commas are always plain text to the attention parser,
+    so the n-th comma in its chunks is the n-th comma of the prompt.
+    """
+    weights = []
+    current = None
+    for text, weight in parse_attention(prompt):
+        for i, part in enumerate(text.split(',')):
+            if i > 0:
+                weights.append(current if current is not None else 1.0)
+                current = None
+            if current is None and part.strip():
+                current = weight
+    weights.append(current if current is not None else 1.0)
+    return weights
+
+def lora_weight(tag):
+    """Returns the multiplier of a <lora:name:weight> tag (1.0 if omitted), None for other tags."""
+    if not tag.startswith('<lora:'):
+        return None
+    match = RE_LORA_WEIGHT.match(tag)
+    if match:
+        try:
+            return float(match.group(1))
+        except ValueError:
+            pass
+    return 1.0
+
+def parse_prompt(prompt, structured=False):
     """
     Splits prompt by comma and normalizes each tag.
-    Returns a list of tags.
+    Returns a list of tags, or of PromptToken if structured is True.
     """
     if not prompt:
         return []
@@ -85,4 +206,11 @@ def parse_prompt(prompt):
 
     # Normalize segments and filter out empty ones
     tags = [normalize_tag(s) for s in segments]
-    return [t for t in tags if t]
+    if not structured:
+        return [t for t in tags if t]
+
+    tokens = []
+    for tag, weight in zip(tags, segment_weights(prompt)):
+        if tag:
+            tokens.append(PromptToken(tag, round(weight, 4), len(tokens), lora_weight(tag)))
+    return tokens
@@ -0,0 +1,131 @@
+import os
+import struct
+import logging
+from collections import deque, namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+# Size of the first read issued for every file. Covers the PNG text chunks and
+# JPEG APP segments written by A1111 in practically all cases, so most files
+# cost exactly one round trip on a network share.
+HEAD_SIZE = 256 * 1024
+
+# data is None if the read failed; mtime is None if the file could not be stat'ed
+PrefetchedFile = namedtuple('PrefetchedFile', ['path', 'data', 'mtime'])
+
+# Number of files read ahead of the parser.
+PREFETCH_WORKERS = int(os.environ.get("PREFETCH_WORKERS", "8"))
+
+PNG_SIGNATURE = b'\x89PNG\r\n\x1a\n'
+
+# PNG text keywords extract_prompt returns on; if none of them precedes the
+# image data we cannot tell where the metadata is and need the whole file.
+PNG_PROMPT_KEYWORDS = (b'parameters', b'prompt')
+
+# JPEG markers without a length field
+JPEG_STANDALONE_MARKERS = {0x01, 0xD8} | set(range(0xD0, 0xD8))
+
+def _png_extent(head):
+    """Returns bytes needed to open a PNG up to its first IDAT, or None."""
+    pos = len(PNG_SIGNATURE)
+    found_prompt = False
+    while pos + 8 <= len(head):
+        length, chunk_type = struct.unpack('>I4s', head[pos:pos + 8])
+        if chunk_type in (b'IDAT', b'IEND'):
+            # Pillow stops parsing at the IDAT header
+            return pos + 8 if found_prompt else None
+        if chunk_type in (b'tEXt', b'zTXt', b'iTXt'):
+            keyword = head[pos + 8:pos + 8 + 80].split(b'\x00', 1)[0]
+            if keyword in PNG_PROMPT_KEYWORDS:
+                found_prompt = True
+        pos += 12 + length  # header + data + crc
+    return None
+
+def _jpeg_extent(head):
+    """Returns bytes needed to open a JPEG up to its start-of-scan segment, or None."""
+    pos = 2
+    while pos + 4 <= len(head):
+        if head[pos] != 0xFF:
+            return None
+        marker = head[pos + 1]
+        if marker == 0xFF:  # fill byte
+            pos += 1
+            continue
+        if marker in JPEG_STANDALONE_MARKERS:
+            pos += 2
+            continue
+        length = struct.unpack('>H', head[pos + 2:pos + 4])[0]
+        # Multi-picture files make Pillow seek to the other frames
+        if marker == 0xE2 and head[pos + 4:pos + 8] == b'MPF\x00':
+            return None
+        if marker == 0xDA:
+            return pos + 2 + length
+        pos += 2 + length
+    return None
+
+def metadata_extent(head):
+    """
+    Returns how many leading bytes of a file are needed to extract its prompt,
+    or None if the whole file is needed.
+    PNG is walked up to the first IDAT chunk and JPEG up to the start of scan.
+    WebP stores EXIF after the bitstream and Pillow decodes it from the full
+    buffer, so it (like any unknown layout) needs the whole file.
+    """
+    if head.startswith(PNG_SIGNATURE):
+        return _png_extent(head)
+    if head.startswith(b'\xff\xd8'):
+        return _jpeg_extent(head)
+    return None
+
+def read_metadata_bytes(path, head_size=HEAD_SIZE, opener=open):
+    """
+    Reads the leading bytes of a file that hold its metadata.
+    Issues one large read of `head_size` bytes and, only if the metadata
+    extends beyond it, a second read for the rest.
+    """
+    with opener(path, 'rb') as f:
+        head = f.read(head_size)
+        if len(head) < head_size:
+            return head  # whole file already read
+        extent = metadata_extent(head)
+        if extent is not None and extent <= len(head):
+            return head[:extent]
+        logger.debug(f"Metadata of {path} extends past {head_size} bytes, reading more")
+        rest = f.read() if extent is None else f.read(extent - len(head))
+        return head + rest
+
+def _prefetch_one(path, head_size, opener):
+    # The stat runs on the pool too, so its round trip overlaps with other reads
+    data = read_metadata_bytes(path, head_size, opener)
+    try:
+        mtime = os.stat(path).st_mtime
+    except OSError:
+        mtime = None
+    return data, mtime
+
+def prefetch_metadata(paths, workers=PREFETCH_WORKERS, head_size=HEAD_SIZE, opener=open):
+    """
+    Yields PrefetchedFile(path, data, mtime) in input order while up to
+    `workers` files are read ahead on a bounded thread pool. `data` is None
+    if the read failed, so callers can fall back to opening the path directly.
+    """
+    pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="prefetch")
+    pending = deque()
+
+    def result(path, future):
+        try:
+            return PrefetchedFile(path, *future.result())
+        except Exception as e:
+            logger.warning(f"Prefetch failed for {path}: {e}")
+            return PrefetchedFile(path, None, None)
+
+    try:
+        for path in paths:
+            pending.append((path, pool.submit(_prefetch_one, path, head_size, opener)))
+            if len(pending) > workers:
+                yield result(*pending.popleft())
+        while pending:
+            yield result(*pending.popleft())
+    finally:
+        pool.shutdown(wait=True, cancel_futures=True)
@@ -0,0 +1,75 @@
+import logging
+from collections import namedtuple
+from datetime import date
+from loader import get_image_files_generator, extract_metadata
+from prefetch import prefetch_metadata
+from parser import parse_prompt
+from aggregator import TagStatistics
+from timeline import TagTimeline
+from thumbnails import add_example
+from dedup import HashCache, stat_files, find_duplicates
+
+logger = logging.getLogger(__name__)
+
+ScanResult = namedtuple('ScanResult', ['total_files', 'tag_counts', 'timeline', 'examples', 'stats', 'duplicates'])
+
+def scan_path(path, on_progress=None, batch_size=10, dedup=False, hash_cache=None):
+    """
+    Aggregates tags of all images under path.
+    on_progress(processed, total, tag_counts) is called from the scanning
+    thread every batch_size images and once at the end.
+    With dedup, files with identical content are counted once; the number
+    skipped is returned as ScanResult.duplicates.
+    """
+    duplicates = set()
+    if dedup:
+        # First pass stats every file so duplicates can be grouped by size
+        files = stat_files(get_image_files_generator(path))
+        total_files = len(files)
+        cache = hash_cache if hash_cache is not None else HashCache()
+        duplicates = find_duplicates(files, cache)
+        cache.prune(path, [f[0] for f in files])
+        try:
+            cache.save()
+        except OSError as e:
+            logger.warning(f"Could not save hash cache: {e}")
+        logger.info(f"Found {total_files} images in {path}, skipping {len(duplicates)} duplicates")
+    else:
+        # Lazy iteration: first pass to get total count for progress bar
+        total_files = sum(1 for _ in get_image_files_generator(path))
+        logger.info(f"Found {total_files} images in {path}")
+    to_process = total_files - len(duplicates)
+
+    tag_counts = {}
+    timeline = TagTimeline()
+    examples = {}
+    stats = TagStatistics()
+
+    # Second pass: lazy iteration for processing, reading metadata ahead in the background
+    paths = (f for f in get_image_files_generator(path) if f not in duplicates)
+    for i, (f, data, mtime) in enumerate(prefetch_metadata(paths)):
+        prompt, generated = extract_metadata(f, data)
+        tokens = parse_prompt(prompt, structured=True)
+        tags = [token.tag for token in tokens]
+
+        # Update counts
+        for tag in tags:
+            tag_counts[tag] = tag_counts.get(tag, 0) + 1
+        # Weight/position statistics are updated in the same pass
+        stats.add(tokens)
+
+        # Bucket by generation date from metadata, falling back to file mtime
+        if tags:
+            if generated is None and mtime is not None:
+                generated = date.fromtimestamp(mtime)
+            if generated is not None:
+                timeline.add(tags, generated)
+            add_example(examples, tags, f)
+
+        # Update progress and log in batches
+        if (i + 1) % batch_size == 0 or (i + 1) == to_process:
+            if on_progress:
+                on_progress(i + 1, to_process, tag_counts)
+            logger.info(f"Progress: {i + 1}/{to_process} images processed")
+
+    return ScanResult(total_files, tag_counts, timeline, examples, stats, len(duplicates))
@@ -1,6 +1,27 @@
-from parser import parse_prompt, normalize_tag
-from aggregator import aggregate_tags
-from editor import delete_tags, rename_tag, merge_tags
+import os
+import json
+import shutil
+import struct
+import tempfile
+from datetime import date
+import piexif
+from PIL import Image
+from PIL.PngImagePlugin import PngInfo
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from parser import parse_prompt, normalize_tag, clean_text, is_printable
+from aggregator import aggregate_tags, TagStatistics
+from editor import delete_tags, rename_tag, merge_tags, merge_examples, apply_edit, table_edits
+from exporter import select_tags, export_tags
+from timeline import TagTimeline
+from loader import extract_prompt, extract_comfyui_prompt, detect_utf16_byte_order, decode_exif_user_comment
+from prefetch import read_metadata_bytes, metadata_extent, PNG_SIGNATURE
+from thumbnails import ThumbnailCache, make_thumbnail
+import api
+from scanner import scan_path
+from dedup import HashCache, stat_files, find_duplicates, PARTIAL_HASH_BYTES
+
+FIXTURE_DIR = os.path.dirname(os.path.abspath(__file__))
 
 def test_normalization():
     assert normalize_tag("a girl") == "a girl"
@@ -17,6 +38,171 @@ def test_parsing():
     assert parse_prompt(prompt) == expected
     print("test_parsing passed")
 
+def test_structured_parsing():
+    prompt = "(white dress, blue eyes:1.3), [a girl], ((pigtails)), <lora:style:0.7>"
+    tokens = parse_prompt(prompt, structured=True)
+    assert [t.tag for t in tokens] == parse_prompt(prompt)
+    assert [t.weight for t in tokens] == [1.3, 1.3, 0.9091, 1.21, 1.0]
+    assert [t.position for t in tokens] == [0, 1, 2, 3, 4]
+    assert [t.lora_weight for t in tokens] == [None, None, None, None, 0.7]
+    print("test_structured_parsing passed")
+
+def test_tag_statistics():
+    stats = TagStatistics()
+    stats.add(parse_prompt("(a girl:1.4), white dress", structured=True))
+    stats.add(parse_prompt("white dress, a girl", structured=True))
+    summary = stats.get("a girl")
+    assert summary["mean_weight"] == 1.2
+    assert (summary["min_weight"], summary["max_weight"]) == (1.0, 1.4)
+    assert summary["mean_position"] == 0.5
+    stats.merge(["white dress"], "a girl")
+    stats = TagStatistics.from_dict(stats.to_dict())
+    assert stats.get("a girl")["mean_weight"] == 1.1
+    assert stats.get("white dress") is None
+    print("test_tag_statistics passed")
+
+def test_clean_text():
+    assert clean_text("a\x00 girl\x1b, 中文") == "a girl, 中文"
+    assert clean_text("line\nbreak\ttab") == "linebreaktab"
+    assert is_printable("line\nbreak\ttab")
+    assert not is_printable("\x00\x01\x02abc")
+    print("test_clean_text passed")
+
+def test_exif_user_comment():
+    # Same results as the per-encoding decode heuristics they replaced
+    assert extract_prompt(os.path.join(FIXTURE_DIR, "test_ascii.jpg")) == "ascii prompt, cool"
+    assert extract_prompt(os.path.join(FIXTURE_DIR, "test_raw.jpg")) == "raw utf8 prompt"
+    assert extract_prompt(os.path.join(FIXTURE_DIR, "test_unicode.jpg")) == "unicode prompt, nice"
+
+    text = "1girl, 日本語"
+    assert detect_utf16_byte_order(text.encode("utf-16le")) == "utf-16le"
+    assert detect_utf16_byte_order(text.encode("utf-16be")) == "utf-16be"
+    assert detect_utf16_byte_order(text.encode("utf-16")) == "utf-16"
+    # No ASCII to tell them apart: little-endian, as A1111 writes it
+    assert detect_utf16_byte_order("日本語".encode("utf-16le")) == "utf-16le"
+    for encoding in ("utf-16le", "utf-16be", "utf-16"):
+        assert decode_exif_user_comment(b"UNICODE\x00" + text.encode(encoding)) == text
+    print("test_exif_user_comment passed")
+
+def test_merge_examples():
+    examples = {"a": ["1.png", "2.png"], "b": ["2.png", "3.png"], "c": ["4.png"]}
+    merged = merge_examples(examples, ["a", "b"], "c", limit=3)
+    assert merged == {"c": ["4.png", "1.png", "2.png"]}
+    assert examples["a"] == ["1.png", "2.png"]
+    print("test_merge_examples passed")
+
+def test_apply_edit():
+    timeline = TagTimeline()
+    timeline.add(["a girl", "girl", "blue eyes"], date(2024, 1, 1))
+    tag_counts = {"a girl": 2, "girl": 1, "blue eyes": 1}
+    examples = {"a girl": ["1.png"], "girl": ["2.png"], "blue eyes": ["1.png"]}
+    tag_counts, examples = apply_edit(tag_counts, timeline, examples, "merge", ["a girl", "girl"], "1girl")
+    tag_counts, examples = apply_edit(tag_counts, timeline, examples, "delete", ["blue eyes"])
+    assert tag_counts == {"1girl": 3}
+    assert examples == {"1girl": ["1.png", "2.png"]}
+    assert timeline.counts(date(2024, 1, 1), date(2024, 1, 1)) == {"1girl": 2}
+    print("test_apply_edit passed")
+
+def test_table_edits():
+    old = ["a girl", "dress", "hat"]
+    # Rows are matched by the tag they were rendered from, so reordering alone is no edit
+    assert table_edits(old, [("hat", "hat"), ("dress", "dress"), ("a girl", "a girl")]) == []
+    assert table_edits(old, [("hat", ""), ("a girl", "a girl"), ("dress", "white dress")]) == [
+        ('delete', ["hat"], None), ('rename', ["dress"], "white dress")
+    ]
+    # Removed rows are deletes, rows added in the UI have no history to move
+    assert table_edits(old, [("a girl", "a girl"), ("hat", "hat"), (None, "new tag")]) == [
+        ('delete', ["dress"], None)
+    ]
+    print("test_table_edits passed")
+
+def test_thumbnail_cache():
+    with tempfile.TemporaryDirectory() as d:
+        images = []
+        for i, ext in enumerate(("jpg", "png", "jpg", "png")):
+            path = os.path.join(d, f"{i}.{ext}")
+            Image.effect_noise((1024, 768), 32 + i).convert("RGB").save(path)
+            images.append(path)
+        assert max(make_thumbnail(images[0], 128).size) == 128
+        assert max(make_thumbnail(images[1], 128).size) == 128
+
+        cache = ThumbnailCache(os.path.join(d, "thumbs"), max_bytes=10 ** 9, size=128)
+        thumb = cache.get(images[0])
+        # A hit serves the cached file and marks it recently used
+        with open(thumb, "wb") as f:
+            f.write(b"cached")
+        os.utime(thumb, (0, 0))
+        assert cache.get(images[0]) == thumb
+        assert open(thumb, "rb").read() == b"cached" and os.path.getmtime(thumb) > 0
+
+        # Room for about two thumbnails: older ones are evicted, never the one just added
+        cache = ThumbnailCache(os.path.join(d, "small"), size=128)
+        cache.max_bytes = int(os.path.getsize(cache.get(images[0])) * 2.5)
+        for path in images[1:]:
+            thumb = cache.get(path)
+            assert os.path.exists(thumb)
+            assert sum(e.stat().st_size for e in os.scandir(cache.directory)) <= cache.max_bytes
+        assert len(os.listdir(cache.directory)) < len(images)
+    print("test_thumbnail_cache passed")
+
+def test_export():
+    tag_counts = {"a girl": 5, "white dress": 2, "<lora:style:0.8>": 3, "rare": 1}
+    assert select_tags(tag_counts, min_count=2) == [("a girl", 5), ("<lora:style:0.8>", 3), ("white dress", 2)]
+    assert select_tags(tag_counts, top_n=1, lora_filter="no_lora") == [("a girl", 5)]
+    with tempfile.TemporaryDirectory() as d:
+        paths = export_tags(tag_counts, d, formats=("tsv", "yaml"), min_count=2, split_categories=True)
+        assert sorted(os.path.basename(p) for p in paths) == [
+            "wildcard_lora.tsv", "wildcard_lora.yaml", "wildcard_tags.tsv", "wildcard_tags.yaml"
+        ]
+        with open(os.path.join(d, "wildcard_tags.tsv")) as f:
+            assert f.read() == "a girl\t5\nwhite dress\t2\n"
+        with open(os.path.join(d, "wildcard_lora.yaml")) as f:
+            assert f.read() == 'wildcard_lora:\n  - "<lora:style:0.8>"\n'
+        assert not [f for f in os.listdir(d) if f.startswith(".export-")]
+        # wildcard.txt keeps its alphabetical order unless another order is requested
+        export_tags(tag_counts, d, formats=("txt", "tsv"))
+        with open(os.path.join(d, "wildcard.txt")) as f:
+            assert f.read() == "<lora:style:0.8>\na girl\nrare\nwhite dress\n"
+        with open(os.path.join(d, "wildcard.tsv")) as f:
+            assert f.read().startswith("a girl\t5\n")
+        export_tags(tag_counts, d, order="count")
+        with open(os.path.join(d, "wildcard.txt")) as f:
+            assert f.read() == "a girl\n<lora:style:0.8>\nwhite dress\nrare\n"
+    print("test_export passed")
+
+def test_timeline():
+    timeline = TagTimeline()
+    timeline.add(["a girl", "white dress"], date(2024, 1, 1))
+    timeline.add(["a girl"], date(2024, 1, 5))
+    timeline.add(["a girl", "blue eyes"], date(2024, 1, 9))
+    assert timeline.counts(date(2024, 1, 1), date(2024, 1, 5)) == {"a girl": 2, "white dress": 1}
+    assert timeline.span() == (date(2024, 1, 1), date(2024, 1, 9))
+    # 01-06..01-10 vs. 01-01..01-05
+    assert timeline.trends(date(2024, 1, 6), date(2024, 1, 10)) == [
+        ("blue eyes", 1, 0, 1), ("a girl", 1, 2, -1), ("white dress", 0, 1, -1)
+    ]
+    timeline.merge(["white dress", "blue eyes"], "dress")
+    timeline = TagTimeline.from_dict(timeline.to_dict())
+    assert timeline.counts(date(2024, 1, 1), date(2024, 1, 31)) == {"a girl": 3, "dress": 2}
+    print("test_timeline passed")
+
+def test_comfyui_prompt():
+    graph = {
+        "3": {"class_type": "KSampler", "inputs": {"positive": ["10", 0], "negative": ["7", 0], "seed": 1}},
+        "6": {"class_type": "CLIPTextEncode", "inputs": {"text": "a girl, white dress", "clip": ["4", 1]}},
+        "7": {"class_type": "CLIPTextEncode", "inputs": {"text": "blue eyes", "clip": ["4", 1]}},
+        "10": {"class_type": "ConditioningSetArea", "inputs": {"conditioning": ["6", 0]}},
+    }
+    assert extract_comfyui_prompt(json.dumps(graph)) == "a girl, white dress"
+    # Text linked from a primitive node; same structure with a non-string value yields no prompt
+    graph["6"]["inputs"]["text"] = ["11", 0]
+    graph["11"] = {"class_type": "PrimitiveNode", "inputs": {"value": "pigtails"}}
+    assert extract_comfyui_prompt(json.dumps(graph)) == "pigtails"
+    graph["11"]["inputs"]["value"] = 5
+    assert extract_comfyui_prompt(json.dumps(graph)) == ""
+    assert extract_comfyui_prompt("not a graph") is None
+    print("test_comfyui_prompt passed")
+
 def test_aggregation():
     tag_lists = [
         ["a girl", "white dress"],
@@ -26,8 +212,154 @@ def test_aggregation():
     assert aggregate_tags(tag_lists) == expected
     print("test_aggregation passed")
 
+def test_find_duplicates():
+    big = os.urandom(3 * PARTIAL_HASH_BYTES)
+    # Same size, head and tail as big: only the full hash tells them apart
+    middle = big[:PARTIAL_HASH_BYTES] + bytes(PARTIAL_HASH_BYTES) + big[-PARTIAL_HASH_BYTES:]
+    contents = {"a/1.png": big, "b/1.png": big, "c/2.png": middle, "a/small.png": b"x" * 10, "b/small.png": b"x" * 10}
+    with tempfile.TemporaryDirectory() as d:
+        for name, data in contents.items():
+            os.makedirs(os.path.join(d, os.path.dirname(name)), exist_ok=True)
+            with open(os.path.join(d, name), "wb") as f:
+                f.write(data)
+        files = stat_files(sorted(os.path.join(d, name) for name in contents))
+        cache = HashCache(os.path.join(d, "hash_cache.json"))
+        expected = {os.path.join(d, "b/1.png"), os.path.join(d, "b/small.png")}
+        assert find_duplicates(files, cache) == expected
+        cache.save()
+        assert os.stat(cache.path).st_mode & 0o777 == 0o644
+        # Reloaded cache answers without rehashing
+        cache = HashCache(cache.path)
+        path, size, mtime_ns = next(f for f in files if f[0].endswith("2.png"))
+        assert cache.get(path, size, mtime_ns, "full")
+        assert find_duplicates(files, cache) == expected
+    print("test_find_duplicates passed")
+
+PARAMS = "masterpiece, 1girl, white dress\nNegative prompt: lowres\nSteps: 20"
+
+def _png_with_text_after_idat(path):
+    # Pillow writes text chunks before IDAT; move the parameters chunk behind the image data
+    with open(path, "rb") as f:
+        data = f.read()
+    chunks, pos = [], len(PNG_SIGNATURE)
+    while pos < len(data):
+        length = struct.unpack(">I", data[pos:pos + 4])[0]
+        chunks.append(data[pos:pos + 12 + length])
+        pos += 12 + length
+    text = [c for c in chunks if c[4:8] == b"tEXt"]
+    rest = [c for c in chunks if c[4:8] != b"tEXt"]
+    with open(path, "wb") as f:
+        f.write(PNG_SIGNATURE + b"".join(rest[:-1] + text + rest[-1:]))
+
+def test_prefetch_metadata_bytes():
+    noise = Image.effect_noise((256, 256), 64).convert("RGB")
+    info = PngInfo()
+    info.add_text("parameters", PARAMS)
+    # Large enough that the EXIF segment spans several small heads
+    exif = piexif.dump({"Exif": {piexif.ExifIFD.UserComment: b"UNICODE\x00" + (PARAMS * 50).encode("utf-16le")}})
+    with tempfile.TemporaryDirectory() as d:
+        png, late_png, jpg, webp, tiny = (os.path.join(d, n) for n in ("a.png", "b.png", "c.jpg", "d.webp", "e.png"))
+        noise.save(png, pnginfo=info)
+        noise.save(late_png, pnginfo=info)
+        _png_with_text_after_idat(late_png)
+        noise.save(jpg, exif=exif)
+        noise.save(webp, exif=exif)
+        noise.resize((8, 8)).save(tiny, pnginfo=info)
+
+        for path in (png, late_png, jpg, webp, tiny):
+            expected = extract_prompt(path)
+            # Image.open only parses text chunks ahead of IDAT, so late text is not extracted either way
+            assert expected.startswith("masterpiece, 1girl") or path == late_png, path
+            for head_size in (64, 1024, 4096):
+                assert extract_prompt(path, read_metadata_bytes(path, head_size=head_size)) == expected, (path, head_size)
+
+        # Text before IDAT stops at the image data, text after it needs the whole file
+        assert len(read_metadata_bytes(png, head_size=4096)) < os.path.getsize(png)
+        assert len(read_metadata_bytes(late_png, head_size=4096)) == os.path.getsize(late_png)
+        # EXIF larger than the head: the scan start is unknown, so the second read takes the rest
+        assert len(read_metadata_bytes(jpg, head_size=4096)) == os.path.getsize(jpg)
+        # Scan header cut off by the head: the second read stops at the end of the segment
+        with open(jpg, "rb") as f:
+            extent = metadata_extent(f.read())
+        assert 4096 < extent < os.path.getsize(jpg)
+        data = read_metadata_bytes(jpg, head_size=extent - 2)
+        assert len(data) == extent and extract_prompt(jpg, data) == extract_prompt(jpg)
+        assert read_metadata_bytes(tiny) == open(tiny, "rb").read()
+    print("test_prefetch_metadata_bytes passed")
+
+def _write_png(path, prompt):
+    info = PngInfo()
+    info.add_text("parameters", f"{prompt}\nNegative prompt: lowres\nSteps: 20")
+    Image.new("RGB", (8, 8)).save(path, pnginfo=info)
+
+def test_scan_dedup():
+    with tempfile.TemporaryDirectory() as d:
+        tree = os.path.join(d, "input")
+        os.makedirs(os.path.join(tree, "curated"))
+        _write_png(os.path.join(tree, "a.png"), "a girl, white dress")
+        _write_png(os.path.join(tree, "b.png"), "a girl, hat")
+        shutil.copy(os.path.join(tree, "a.png"), os.path.join(tree, "curated", "a.png"))
+        cache = HashCache(os.path.join(d, "hash_cache.json"))
+
+        result = scan_path(tree, dedup=True, hash_cache=cache)
+        assert result.total_files == 3 and result.duplicates == 1
+        assert result.tag_counts == {"a girl": 2, "white dress": 1, "hat": 1}
+        assert os.path.exists(cache.path)
+        # Without dedup every copy counts
+        result = scan_path(tree)
+        assert result.duplicates == 0 and result.tag_counts["white dress"] == 2
+    print("test_scan_dedup passed")
+
+def test_api_scan_round_trip():
+    server = FastAPI()
+    server.include_router(api.router)
+    client = TestClient(server)
+    with tempfile.TemporaryDirectory() as d:
+        for i, prompt in enumerate(("a girl, white dress", "a girl, (dress:1.2)", "a girl, hat")):
+            _write_png(os.path.join(d, f"{i}.png"), prompt)
+
+        response = client.post("/api/v1/scans", json={"path": d})
+        assert response.status_code == 202
+        job_id = response.json()["id"]
+        with client.stream("GET", f"/api/v1/scans/{job_id}/events?interval=0.5") as events:
+            lines = [line for line in events.iter_lines() if line]
+        assert lines[-2] == "event: done"
+        done = json.loads(lines[-1][len("data: "):])
+        assert done["processed"] == done["total"] == 3 and done["unique_tags"] == 4
+
+        page = client.get(f"/api/v1/scans/{job_id}/counts?offset=1&limit=2").json()
+        assert page["total"] == 4
+        assert page["counts"] == [["dress", 1], ["hat", 1]]  # count descending, then tag
+        row = client.get(f"/api/v1/scans/{job_id}/counts?limit=1&stats=true").json()["counts"][0]
+        assert row["tag"] == "a girl" and row["count"] == 3 and row["mean_weight"] == 1.0
+
+        edit = {"operations": [{"op": "merge", "tags": ["white dress", "dress"], "target": "dress"}]}
+        assert client.post(f"/api/v1/scans/{job_id}/edits", json=edit).status_code == 200
+        counts = client.get(f"/api/v1/scans/{job_id}/counts").json()["counts"]
+        assert counts == [["a girl", 3], ["dress", 2], ["hat", 1]]
+
+        bad = {"operations": [{"op": "rename", "tags": ["hat"]}]}
+        assert client.post(f"/api/v1/scans/{job_id}/edits", json=bad).status_code == 400
+        assert client.get("/api/v1/scans/unknown").status_code == 404
+    print("test_api_scan_round_trip passed")
+
 if __name__ == "__main__":
     test_normalization()
     test_parsing()
+    test_structured_parsing()
+    test_tag_statistics()
+    test_clean_text()
+    test_exif_user_comment()
     test_aggregation()
+    test_merge_examples()
+    test_apply_edit()
+    test_table_edits()
+    test_thumbnail_cache()
+    test_export()
+    test_timeline()
+    test_comfyui_prompt()
+    test_find_duplicates()
+    test_prefetch_metadata_bytes()
+    test_scan_dedup()
+    test_api_scan_round_trip()
     print("All tests passed!")
@@ -0,0 +1,108 @@
+import os
+import hashlib
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from PIL import Image
+
+logger = logging.getLogger(__name__)
+
+THUMBNAIL_DIR = "/data/thumbnails"
+THUMBNAIL_SIZE = 256
+# Size budget of the on-disk cache, least recently used thumbnails are evicted beyond it
+MAX_CACHE_BYTES = int(os.environ.get("THUMBNAIL_CACHE_MB", "200")) * 1024 * 1024
+# Example images remembered per tag during a scan
+MAX_EXAMPLES_PER_TAG = 6
+
+# Thumbnails are generated here so Gradio's event loop never waits on Pillow or disk I/O
+THUMBNAIL_POOL = ThreadPoolExecutor(max_workers=4, thread_name_prefix="thumbnail")
+
+def _cache_key(image_path, stat):
+    # Keyed by path + mtime + size so edited files get a fresh thumbnail
+    key = f"{image_path}\0{stat.st_mtime_ns}\0{stat.st_size}"
+    return hashlib.sha1(key.encode("utf-8", "surrogateescape")).hexdigest()
+
+def make_thumbnail(image_path, size=THUMBNAIL_SIZE):
+    """
+    Loads a downscaled RGB copy of an image.
+    Uses JPEG draft mode (DCT scaling while decoding) and Image.reduce
+    (integer box downscale) before the final resize, so large images are
+    never fully processed at their original resolution.
+    """
+    with Image.open(image_path) as img:
+        img.draft('RGB', (size, size))  # no-op for non-JPEG
+        factor = min(img.width, img.height) // size
+        if factor >= 2:
+            img = img.reduce(factor)
+        img = img.convert('RGB')
+        img.thumbnail((size, size))
+        return img
+
+class ThumbnailCache:
+    """Size-bounded LRU cache of JPEG thumbnails on disk, ordered by file mtime."""
+    def __init__(self, directory=THUMBNAIL_DIR, max_bytes=MAX_CACHE_BYTES, size=THUMBNAIL_SIZE):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.size = size
+        self._lock = threading.Lock()
+        self._total_bytes = None  # computed on first use
+
+    def _entries(self):
+        entries = []
+        for entry in os.scandir(self.directory):
+            if entry.name.endswith(".jpg"):
+                st = entry.stat()
+                entries.append((st.st_mtime, st.st_size, entry.path))
+        return entries
+
+    def get(self, image_path):
+        """Returns the path of a cached thumbnail for image_path, generating it if needed."""
+        stat = os.stat(image_path)
+        thumb_path = os.path.join(self.directory, _cache_key(image_path, stat) + ".jpg")
+        try:
+            os.utime(thumb_path)  # mark as recently used
+            return thumb_path
+        except FileNotFoundError:
+            pass
+
+        img = make_thumbnail(image_path, self.size)
+        os.makedirs(self.directory, exist_ok=True)
+        tmp_path = f"{thumb_path}.{threading.get_ident()}.tmp"
+        img.save(tmp_path, "JPEG", quality=85)
+        os.replace(tmp_path, thumb_path)
+        self._added(thumb_path)
+        return thumb_path
+
+    def _added(self, thumb_path):
+        nbytes = os.path.getsize(thumb_path)
+        with self._lock:
+            if self._total_bytes is None:
+                self._total_bytes = sum(size for _, size, _ in self._entries())
+            else:
+                self._total_bytes += nbytes
+            if self._total_bytes > self.max_bytes:
+                self._evict(keep=thumb_path)
+
+    def _evict(self, keep):
+        # Drop least recently used thumbnails until below 90% of the budget,
+        # never the one that is about to be served
+        entries = sorted(e for e in self._entries() if e[2] != keep)
+        total = sum(size for _, size, _ in entries) + os.path.getsize(keep)
+        target = self.max_bytes * 0.9
+        for _, size, path in entries:
+            if total <= target:
+                break
+            try:
+                os.remove(path)
+                total -= size
+            except OSError:
+                pass
+        logger.info(f"Thumbnail cache evicted down to {total / 1024 / 1024:.1f} MB")
+        self._total_bytes = total
+
+def add_example(examples, tags, image_path, limit=MAX_EXAMPLES_PER_TAG):
+    """Remembers image_path as an example of each tag, up to limit per tag."""
+    for tag in tags:
+        paths = examples.setdefault(tag, [])
+        if len(paths) < limit and image_path not in paths:
+            paths.append(image_path)
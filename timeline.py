@@ -0,0 +1,121 @@
+import logging
+from array import array
+from bisect import bisect_left, bisect_right
+from collections import defaultdict
+from datetime import date, timedelta
+
+logger = logging.getLogger(__name__)
+
+class TagTimeline:
+    """
+    Per-tag counts bucketed by day (date ordinals), built during the scan.
+    Each tag is compacted into a sorted array of days plus cumulative counts,
+    so the count for any date range is two bisects and a subtraction.
+    Weeks or months are just wider ranges over the same day buckets.
+    """
+    def __init__(self):
+        self._pending = defaultdict(lambda: defaultdict(int))  # tag -> {day: count}
+        self._days = {}  # tag -> array of day ordinals (sorted)
+        self._cumulative = {}  # tag -> array of running totals, with a leading 0
+
+    def add(self, tags, day):
+        """Records one image's tags on the given date."""
+        ordinal = day.toordinal()
+        for tag in tags:
+            self._pending[tag][ordinal] += 1
+
+    def _compact(self):
+        if not self._pending:
+            return
+        for tag, buckets in self._pending.items():
+            if tag in self._days:
+                for d, c in self._bucket_items(tag):
+                    buckets[d] += c
+            days = sorted(buckets)
+            cumulative = array('q', [0])
+            total = 0
+            for d in days:
+                total += buckets[d]
+                cumulative.append(total)
+            self._days[tag] = array('l', days)
+            self._cumulative[tag] = cumulative
+        self._pending.clear()
+
+    def _bucket_items(self, tag):
+        days, cumulative = self._days[tag], self._cumulative[tag]
+        return [(d, cumulative[i + 1] - cumulative[i]) for i, d in enumerate(days)]
+
+    def span(self):
+        """Returns (first, last) date covered, or None if empty."""
+        self._compact()
+        if not self._days:
+            return None
+        first = min(days[0] for days in self._days.values())
+        last = max(days[-1] for days in self._days.values())
+        return date.fromordinal(first), date.fromordinal(last)
+
+    def counts(self, start, end):
+        """Returns {tag: count} for images dated between start and end (inclusive)."""
+        self._compact()
+        lo, hi = start.toordinal(), end.toordinal()
+        result = {}
+        for tag, days in self._days.items():
+            cumulative = self._cumulative[tag]
+            count = cumulative[bisect_right(days, hi)] - cumulative[bisect_left(days, lo)]
+            if count:
+                result[tag] = count
+        return result
+
+    def trends(self, start, end):
+        """
+        Compares the range with the equally long period right before it.
+        Returns [(tag, count, previous_count, change)] sorted by change descending,
+        so trending tags come first and declining tags last.
+        """
+        length = (end - start).days + 1
+        current = self.counts(start, end)
+        previous = self.counts(start - timedelta(days=length), start - timedelta(days=1))
+        rows = [
+            (tag, current.get(tag, 0), previous.get(tag, 0), current.get(tag, 0) - previous.get(tag, 0))
+            for tag in current.keys() | previous.keys()
+        ]
+        rows.sort(key=lambda x: (-x[3], x[0]))
+        return rows
+
+    def delete(self, tags):
+        for tag in tags:
+            self._pending.pop(tag, None)
+            self._days.pop(tag, None)
+            self._cumulative.pop(tag, None)
+
+    def merge(self, tags, target):
+        """Moves the buckets of tags into target (rename is a merge of one tag)."""
+        self._compact()
+        for tag in tags:
+            if tag == target or tag not in self._days:
+                continue
+            for d, c in self._bucket_items(tag):
+                self._pending[target][d] += c
+            self.delete([tag])
+        self._compact()
+
+    def to_dict(self):
+        """Serializes to {tag: {day_iso: count}} for JSON persistence."""
+        self._compact()
+        return {
+            tag: {date.fromordinal(d).isoformat(): c for d, c in self._bucket_items(tag)}
+            for tag in self._days
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        timeline = cls()
+        for tag, buckets in data.items():
+            for day, count in buckets.items():
+                timeline._pending[tag][date.fromisoformat(day).toordinal()] += int(count)
+        timeline._compact()
+        return timeline
+
+    def __len__(self):
+        self._compact()
+        return len(self._days)